@@ -0,0 +1,163 @@
+import hashlib
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request
+from sqlalchemy.orm import joinedload
+
+from models import db, Posts, Users, paginate_posts, posts_with_posters
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+api = Blueprint('api', __name__)
+
+# Fields a client may ask for with ?fields=a,b,c; everything by default
+POST_FIELDS = ('id', 'title', 'slug', 'date_posted', 'excerpt', 'content', 'author')
+USER_FIELDS = ('id', 'username', 'name', 'about_author', 'created', 'profile_pic')
+MAX_PER_PAGE = 100
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'),
+                      default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value)
+                      ).encode()
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
+def error(status, message):
+    return json_response({'error': message}, status)
+
+
+def requested_fields(allowed):
+    fields = request.args.get('fields')
+    if not fields:
+        return allowed
+    fields = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        return None
+    return fields
+
+
+def requested_per_page():
+    per_page = request.args.get('per_page', current_app.config['POSTS_PER_PAGE'], type=int)
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def weak_etag(*parts):
+    """Weak ETag over the request URL and the versions of the rows it returns."""
+    digest = hashlib.sha1(repr((request.full_path,) + parts).encode()).hexdigest()
+    return digest[:32]
+
+
+def not_modified(etag):
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+
+def conditional_json(data, etag):
+    response = json_response(data)
+    response.set_etag(etag, weak=True)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def serialize_user(user, fields):
+    return {field: getattr(user, field) for field in fields}
+
+
+def serialize_post(post, fields):
+    data = {}
+    for field in fields:
+        if field == 'author':
+            data['author'] = serialize_user(post.poster, ('id', 'username', 'name')) if post.poster else None
+        else:
+            data[field] = getattr(post, field)
+    return data
+
+
+def post_versions():
+    """Light query over just the columns that make up a post's version."""
+    return db.session.query(Posts.id, Posts.date_posted, Posts.revision,
+                            Users.revision.label('author_revision')) \
+        .outerjoin(Users, Posts.poster_id == Users.id)
+
+
+@api.route('/posts')
+def posts():
+    fields = requested_fields(POST_FIELDS)
+    if fields is None:
+        return error(400, f'fields must be a subset of {", ".join(POST_FIELDS)}')
+
+    # Page through versions first: a matching ETag costs one index scan
+    # and no serialization
+    versions, next_cursor, prev_cursor = paginate_posts(post_versions(),
+                                                        after=request.args.get('after'),
+                                                        before=request.args.get('before'),
+                                                        per_page=requested_per_page())
+    etag = weak_etag(tuple(tuple(row) for row in versions), next_cursor, prev_cursor)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    ids = [row.id for row in versions]
+    posts_by_id = {post.id: post for post in
+                   posts_with_posters().filter(Posts.id.in_(ids))}
+    return conditional_json({'posts': [serialize_post(posts_by_id[id], fields)
+                                       for id in ids if id in posts_by_id],
+                             'next': next_cursor,
+                             'prev': prev_cursor},
+                            etag)
+
+
+@api.route('/posts/<int:id>')
+def post(id):
+    fields = requested_fields(POST_FIELDS)
+    if fields is None:
+        return error(400, f'fields must be a subset of {", ".join(POST_FIELDS)}')
+
+    version = post_versions().filter(Posts.id == id).first()
+    if version is None:
+        return error(404, 'post not found')
+    etag = weak_etag(tuple(version))
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    post = db.session.get(Posts, id, options=[joinedload(Posts.poster)])
+    return conditional_json(serialize_post(post, fields), etag)
+
+
+@api.route('/users')
+def users():
+    fields = requested_fields(USER_FIELDS)
+    if fields is None:
+        return error(400, f'fields must be a subset of {", ".join(USER_FIELDS)}')
+
+    per_page = requested_per_page()
+    after = request.args.get('after', 0, type=int)
+    versions = db.session.query(Users.id, Users.revision) \
+        .filter(Users.id > after).order_by(Users.id).limit(per_page + 1).all()
+    next_cursor = versions[per_page - 1].id if len(versions) > per_page else None
+    versions = versions[:per_page]
+    etag = weak_etag(tuple(tuple(row) for row in versions), next_cursor)
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    users = Users.query.filter(Users.id.in_([row.id for row in versions])).order_by(Users.id)
+    return conditional_json({'users': [serialize_user(user, fields) for user in users],
+                             'next': next_cursor},
+                            etag)
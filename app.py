@@ -1,81 +1,412 @@
+import math
 import os
+import sys
 import uuid
+from functools import partial, wraps
 
-from flask import Flask, render_template, flash, request, redirect, url_for
+import click
+from flask import (Blueprint, Flask, Response, abort, current_app, render_template, flash, get_flashed_messages,
+                   request, redirect, session, stream_template, url_for)
+from markupsafe import Markup
 from flask_ckeditor import CKEditor
-from sqlalchemy import MetaData, or_
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from datetime import datetime
+from sqlalchemy import bindparam, inspect, update
+from sqlalchemy.orm import joinedload, make_transient_to_detached
 from datetime import date
 
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
+from flask_login import login_user, LoginManager, login_required, logout_user, current_user
+from werkzeug.local import LocalProxy
 from werkzeug.utils import secure_filename
 
-from webforms import NamerForm, PasswordForm, UserForm, PostForm, LoginForm, SearchForm
-
-app = Flask(__name__)
-ckeditor = CKEditor(app)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///user.db'
-app.config['SECRET_KEY'] = "my super secret key that no one is supposed to know"
-
-
-convention = {
-    "ix": 'ix_%(column_0_label)s',
-    "uq": "uq_%(table_name)s_%(column_0_name)s",
-    "ck": "ck_%(table_name)s_%(constraint_name)s",
-    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
-    "pk": "pk_%(table_name)s"
-}
-
-# db = SQLAlchemy(app)
-# migrate = Migrate(app, db, render_as_batch=True)
-
-metadata = MetaData(naming_convention=convention)
-db = SQLAlchemy(app, metadata=metadata)
-migrate = Migrate(app, db, render_as_batch=True)
-
-UPLOAD_FOLDER = 'static/images'
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
+from api import api, requested_per_page
+from assets import StaticAssets
+from bulk import FORMATS, Checkpoint, Importer, export_rows, guess_format, open_output, read_records, write_records
+from cache import LRUCache, RedisCache
+from compress import CompressionMiddleware
+from config import get_config
+from counters import WriteBehindCounter
+from database import apply_sqlite_pragmas, engine_options
+from hashers import PasswordHasher
+import hooks
+from images import ImagePipeline
+from instrumentation import Instrumentation
+from models import (db, Users, Posts, PostsPage, author_posts, most_viewed_posts, paginate_posts, posts_with_posters,
+                    user_by_email, user_by_username, users_by_created)
+from ratelimit import MemoryBuckets, RateLimiter, SQLiteBuckets
+from uploads import UploadRequest
+from search import SearchPage, rebuild_index
+from slugs import SlugMap, save_post
+
+# Registered at startup: its public API only works through init_app(),
+# which Flask no longer allows once the app has handled a request
+ckeditor = CKEditor()
+assets = StaticAssets()
+instrumentation = Instrumentation()
 
 # Flask_Login Stuff
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
+
+main = Blueprint('main', __name__, cli_group=None)
+
+# Per-app services, set up by create_app()
+password_hasher = LocalProxy(lambda: current_app.extensions['password_hasher'])
+user_cache = LocalProxy(lambda: current_app.extensions['user_cache'])
+fragment_cache = LocalProxy(lambda: current_app.extensions['fragment_cache'])
+page_cache = LocalProxy(lambda: current_app.extensions['page_cache'])
+image_pipeline = LocalProxy(lambda: current_app.extensions['image_pipeline'])
+slug_map = LocalProxy(lambda: current_app.extensions['slug_map'])
+view_counter = LocalProxy(lambda: current_app.extensions['view_counter'])
+compression = LocalProxy(lambda: current_app.extensions['compression'])
+rate_limiter = LocalProxy(lambda: current_app.extensions['rate_limiter'])
+
+
+def create_app(config=None):
+    """Build the app for a config profile name, config class or FLASKER_CONFIG.
+
+    Nothing here opens a database connection, and every forked child
+    drops the connections it inherited, so the app can be created once
+    in a prefork server's master (gunicorn --preload) and shared by the
+    workers. See wsgi.py.
+    """
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.config.from_object(config if config is not None and not isinstance(config, str)
+                           else get_config(config))
+    if not app.config['SECRET_KEY']:
+        raise RuntimeError('SECRET_KEY must be set')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'],
+                                                             pool_size=app.config['DB_POOL_SIZE'],
+                                                             max_overflow=app.config['DB_MAX_OVERFLOW'])
+
+    ckeditor.init_app(app)
+    assets.init_app(app)
+    db.init_app(app)
+    login_manager.init_app(app)
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        # Alembic is slow to import and only `flask db ...` needs it
+        from flask_migrate import Migrate
+        Migrate(app, db, render_as_batch=True)
+
+    with app.app_context():
+        engine = db.engine
+    apply_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'])
+    instrumentation.init_app(app, engine)
+    # A pooled SQLite handle must never be used from two processes
+    hooks.after_fork(engine, lambda engine: engine.dispose(close=False))
+
+    app.extensions['password_hasher'] = PasswordHasher(app.config['PASSWORD_HASH_METHOD'],
+                                                       app.config['PASSWORD_HASH_COST'],
+                                                       app.config['PASSWORD_HASH_WORKERS'])
+    app.extensions['user_cache'] = LRUCache(maxsize=app.config['USER_CACHE_SIZE'],
+                                            ttl=app.config['USER_CACHE_TTL'])
+    if app.config['FRAGMENT_CACHE_BACKEND'] == 'redis':
+        app.extensions['fragment_cache'] = RedisCache(app.config['FRAGMENT_CACHE_REDIS_URL'],
+                                                      prefix='fragment:')
+    else:
+        app.extensions['fragment_cache'] = LRUCache(maxsize=app.config['FRAGMENT_CACHE_SIZE'],
+                                                    max_memory=app.config['FRAGMENT_CACHE_MAX_MEMORY'])
+    app.extensions['page_cache'] = LRUCache(maxsize=app.config['PAGE_CACHE_SIZE'],
+                                            ttl=app.config['PAGE_CACHE_TTL'],
+                                            max_memory=app.config['PAGE_CACHE_MAX_MEMORY'])
+    app.extensions['slug_map'] = SlugMap()
+    app.extensions['view_counter'] = WriteBehindCounter(partial(flush_post_views, app),
+                                                        interval=app.config['VIEW_COUNTER_FLUSH_INTERVAL'],
+                                                        max_pending=app.config['VIEW_COUNTER_MAX_PENDING'])
+    if app.config['RATE_LIMIT_BACKEND'] == 'sqlite':
+        buckets = SQLiteBuckets(os.path.join(app.instance_path, app.config['RATE_LIMIT_DATABASE']))
+    else:
+        buckets = MemoryBuckets(max_keys=app.config['RATE_LIMIT_MAX_KEYS'])
+    app.extensions['rate_limiter'] = RateLimiter(buckets,
+                                                 {'ip': app.config['RATE_LIMIT_PER_IP'],
+                                                  'username': app.config['RATE_LIMIT_PER_USERNAME']},
+                                                 enabled=app.config['RATE_LIMIT_ENABLED'])
+    app.extensions['image_pipeline'] = ImagePipeline(app.config['UPLOAD_FOLDER'],
+                                                     partial(store_profile_pic_variants, app))
+    app.extensions['compression'] = CompressionMiddleware(app.wsgi_app,
+                                                          min_size=app.config['COMPRESSION_MIN_SIZE'],
+                                                          levels=app.config['COMPRESSION_LEVELS'])
+    app.wsgi_app = app.extensions['compression']
+
+    app.register_blueprint(main)
+    # /api always serves the latest version
+    app.register_blueprint(api, url_prefix='/api/v1')
+    app.register_blueprint(api, url_prefix='/api', name='api_latest')
+    return app
+
+
+def store_profile_pic_variants(app, user_id, pic_name, variants):
+    """Record generated thumbnails, unless the user uploaded a newer picture."""
+    with app.app_context():
+        user = db.session.get(Users, user_id)
+        if user is not None and user.profile_pic == pic_name:
+            user.profile_pic_small = variants[150]
+            user.profile_pic_large = variants[300]
+            db.session.commit()
+            user_cache.delete(user_id)
+            invalidate_pages()
+
+
+def flush_post_views(app, counts):
+    """Add {post_id: views} to posts.views in a single transaction."""
+    # A Core UPDATE: no revision bump, views don't change cached fragments
+    statement = update(Posts.__table__) \
+        .where(Posts.__table__.c.id == bindparam('post_id')) \
+        .values(views=Posts.__table__.c.views + bindparam('n'))
+    with app.app_context():
+        db.session.execute(statement, [{'post_id': id, 'n': n} for id, n in counts.items()])
+        db.session.commit()
+
+
+def count_views(view):
+    """Count a view of the post a successful response shows, cached or not."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            id = kwargs['id'] if 'id' in kwargs else slug_map.get(kwargs['slug'])
+            if id is not None:
+                view_counter.incr(id)
+        return response
+    return wrapper
+
+
+@main.app_template_global()
+def post_url(post):
+    """Canonical URL of post: /posts/<slug>, or by id for posts without a slug."""
+    if post.slug:
+        return url_for('main.post', slug=post.slug)
+    return url_for('main.detail_post', id=post.id)
+
+
+POST_FRAGMENTS = ('card', 'detail', 'header')
+
+
+def post_fragment_key(post, variant):
+    author_revision = post.poster.revision if post.poster else 0
+    return variant, post.id, post.revision, author_revision
+
+
+@main.app_template_global()
+def post_fragment(post, variant):
+    """Render templates/_post.html for post, cached per revision of post and author.
+
+    Editing a post or its author bumps a revision, so stale entries are
+    never read again and age out of the LRU.
+    """
+    key = post_fragment_key(post, variant)
+    html = fragment_cache.get(key)
+    if html is None:
+        html = current_app.jinja_env.get_template('_post.html').render(post=post, variant=variant)
+        fragment_cache.set(key, html)
+    return Markup(html)
+
+
+def invalidate_post_fragments(post):
+    for variant in POST_FRAGMENTS:
+        fragment_cache.delete(post_fragment_key(post, variant))
+
+
+def rate_limited(field):
+    """Turn away POSTs over the per IP or per form[field] limit with a 429.
+
+    Runs before the view, so a flood costs neither a user lookup nor a
+    password hash; the 429 is werkzeug's plain page, since base.html may
+    load current_user.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'POST':
+                wait = rate_limiter.hit('ip', request.remote_addr)
+                key = request.form.get(field, '').strip().lower()
+                if not wait and key:
+                    wait = rate_limiter.hit('username', key)
+                if wait:
+                    abort(429, retry_after=math.ceil(wait))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cached_page(view):
+    """Serve anonymous GETs of view from page_cache, keyed by path and query string.
+
+    Logged-in users and visitors with pending flash messages always get a
+    fresh render. Views that change posts or users call invalidate_pages();
+    other worker processes catch up within PAGE_CACHE_TTL.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_user.is_authenticated or session.get('_flashes'):
+            return view(*args, **kwargs)
+        key = request.full_path
+        body = page_cache.get(key)
+        if body is not None:
+            response = cached_page_response(key, body)
+            response.headers['X-Cache'] = 'HIT'
+        else:
+            # Compressed copies of the previous render are stale
+            for encoding in compression.encodings:
+                page_cache.delete((key, encoding))
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.is_streamed:
+                cache_stream(page_cache._get_current_object(), key, response,
+                             current_app.config['PAGE_CACHE_MAX_ENTRY'])
+            elif response.status_code == 200 and not response.direct_passthrough:
+                page_cache.set(key, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+        response.vary.add('Cookie')
+        return response
+    return wrapper
+
+
+def cached_page_response(key, body):
+    """Response for a cached page, compressed at most once per encoding.
+
+    The compressed bytes are kept in page_cache next to the page, so hits
+    skip CompressionMiddleware's per request compression.
+    """
+    encoding = compression.negotiate(request.headers.get('Accept-Encoding'))
+    if encoding is None or len(body) < compression.min_size:
+        return Response(body, mimetype='text/html')
+    encoded = page_cache.get((key, encoding))
+    if encoded is None:
+        encoded = compression.compress(body, encoding, current_app.config['COMPRESSION_CACHED_LEVELS'][encoding])
+        page_cache.set((key, encoding), encoded)
+    response = Response(encoded, mimetype='text/html')
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def cache_stream(cache, key, response, max_size):
+    """Pass response's streamed body through, storing it in cache once it has all been sent."""
+    chunks = response.response
+    body = []
+    sent = False
+
+    def tee():
+        nonlocal body, sent
+        size = 0
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if body is not None:
+                size += len(chunk)
+                # Too big to cache: stop holding on to it
+                if size <= max_size:
+                    body.append(chunk)
+                else:
+                    body = None
+            yield chunk
+        sent = True
+
+    def store():
+        # A HEAD request or a client that went away leaves part of it unread
+        if sent and body is not None:
+            cache.set(key, b''.join(body))
+
+    response.response = tee()
+    # Closing tee() before its first chunk wouldn't close the body it wraps
+    if hasattr(chunks, 'close'):
+        response.call_on_close(chunks.close)
+    response.call_on_close(store)
+
+
+def invalidate_pages():
+    page_cache.clear()
+
+
+def buffered(chunks, size):
+    """Join the small strings Jinja yields into writes of about size characters."""
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_page(template_name, **context):
+    """Like render_template(), but send the page while it renders.
+
+    The top of the page goes out before the listing's query has run, and
+    the rows the template loops over are never all in memory at once as
+    long as it is given a lazy iterable (a yield_per query, PostsPage).
+    """
+    # The session cookie goes out before the body, so the flashes base.html
+    # shows must be popped now for that to be saved; Flask keeps them for
+    # the template's own get_flashed_messages() call
+    get_flashed_messages()
+    session = db.session()
+    stream = stream_template(template_name, **context)
+    response = current_app.response_class(buffered(stream, current_app.config['STREAM_BUFFER_SIZE']),
+                                          mimetype='text/html')
+    # Registered rather than run in a generator's finally, which a HEAD
+    # response's body never starts. stream_template() has pushed the
+    # request context already and only pops it when closed. The app
+    # context teardown closed session before the first chunk, but queries
+    # built by the view are bound to it and reopen it as the template runs
+    response.call_on_close(stream.close)
+    response.call_on_close(session.close)
+    return response
 
 
 # JSON
-@app.route('/date')
+@main.route('/date')
 def get_current_date():
     return {'Date': date.today()}
 
 
-@app.route('/admin')
+@main.route('/admin')
 @login_required
 def admin():
     if current_user.id == 3:
         flash('Wellcome admin')
-        return render_template('admin.html')
+        return render_template('admin.html',
+                               cache_stats={'page': page_cache.stats(),
+                                            'fragment': fragment_cache.stats(),
+                                            'user': user_cache.stats()},
+                               rate_limit_stats=rate_limiter.stats())
     else:
         flash('Sorry yoy are not admin')
-        return render_template(url_for('index'))
+        return render_template(url_for('main.index'))
+
+
+@main.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if current_user.id != 3:
+        flash('Sorry yoy are not admin')
+        return redirect(url_for('main.index'))
+    endpoint = request.args.get('profile')
+    return render_template('admin_metrics.html',
+                           enabled=instrumentation.enabled,
+                           endpoints=sorted(instrumentation.snapshot().items()),
+                           endpoint=endpoint,
+                           profile=instrumentation.profile_report(endpoint) if endpoint else None)
 
 
-@app.route('/')
+@main.route('/')
+@cached_page
 def index():
     return render_template('index.html')
 
 
-@app.route('/user/<name>')
+@main.route('/user/<name>')
 def user(name):
     return render_template('user.html', name=name)
 
 
-@app.route('/name', methods=['GET', 'POST'])
+@main.route('/name', methods=['GET', 'POST'])
 def name():
     name = None
+    from webforms import NamerForm
     form = NamerForm()
     if form.validate_on_submit():
         name = form.name.data
@@ -84,12 +415,14 @@ def name():
     return render_template('name.html', name=name, form=form)
 
 
-@app.route('/test_pw', methods=['GET', 'POST'])
+@main.route('/test_pw', methods=['GET', 'POST'])
+@rate_limited('email')
 def test_pw():
     email = None
     password = None
     pw_to_check = None
     passed = None
+    from webforms import PasswordForm
     form = PasswordForm()
     if form.validate_on_submit():
         email = form.email.data
@@ -97,9 +430,9 @@ def test_pw():
         form.email.data = ''
         form.password_hash.data = ''
 
-        pw_to_check = Users.query.filter_by(email=email).first()
+        pw_to_check = user_by_email(email).first()
 
-        passed = check_password_hash(pw_to_check.password_hash, password)
+        passed = pw_to_check is not None and password_hasher.verify(pw_to_check.password_hash, password)
 
     return render_template('test_pw.html',
                            email=email,
@@ -109,27 +442,29 @@ def test_pw():
                            pw_to_check=pw_to_check,)
 
 
-@app.route('/users_list')
+@main.route('/users_list')
+@cached_page
 def users_list():
-    users = Users.query.all()
-    return render_template('users_list.html',
-                           users=users,)
+    users = Users.query.order_by(Users.id).yield_per(100)
+    return stream_page('users_list.html',
+                       users=users,)
 
 
-@app.errorhandler(404)
+@main.app_errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
 
 
-@app.route('/user/add', methods=['GET', 'POST'])
+@main.route('/user/add', methods=['GET', 'POST'])
 def add_user():
     name = None
     # email = None
+    from webforms import UserForm
     form = UserForm()
     if form.validate_on_submit():
-        user = Users.query.filter_by(email=form.email.data).first()
+        user = user_by_email(form.email.data).first()
         if user is None:
-            hashed_password = generate_password_hash(form.password_hash.data, 'sha256')
+            hashed_password = password_hasher.hash(form.password_hash.data)
             user = Users(username=form.username.data,
                          name=form.name.data,
                          email=form.email.data,
@@ -137,6 +472,7 @@ def add_user():
                          password_hash=hashed_password)
             db.session.add(user)
             db.session.commit()
+            invalidate_pages()
         name = form.name.data
         form.name.data = ''
         form.username.data = ''
@@ -144,18 +480,22 @@ def add_user():
         form.favorite_color.data = ''
         form.password_hash.data = ''
         flash('User added successfully!')
-    our_users = Users.query.order_by(Users.created)
+    our_users = users_by_created()
     return render_template('add_user.html',
                            form=form,
                            name=name,
                            our_users=our_users,)
 
 
-@app.route('/update_user/<int:id>', methods=['POST', 'GET'])
+@main.route('/update_user/<int:id>', methods=['POST', 'GET'])
 @login_required
 def update_user(id):
+    from webforms import UserForm
     form = UserForm()
-    name_to_update = Users.query.get_or_404(id)
+    if id == current_user.id:
+        name_to_update = current_user._get_current_object()
+    else:
+        name_to_update = db.get_or_404(Users, id)
     if request.method == "POST":
         name_to_update.name = request.form['name']
         name_to_update.email = request.form['email']
@@ -164,6 +504,8 @@ def update_user(id):
         name_to_update.about_author = request.form['about_author']
         try:
             db.session.commit()
+            user_cache.delete(id)
+            invalidate_pages()
             flash("User Updated Successfully!")
             return render_template("update_user.html",
                                    form=form,
@@ -181,34 +523,43 @@ def update_user(id):
                                id=id)
 
 
-@app.route('/delete_user/<int:id>')
+@main.route('/delete_user/<int:id>')
 @login_required
 def delete_user(id):
     if id == current_user.id:
-        user_to_delete = Users.query.get_or_404(id)
+        user_to_delete = current_user._get_current_object()
         try:
             db.session.delete(user_to_delete)
             db.session.commit()
+            user_cache.delete(id)
+            invalidate_pages()
             flash('User Deleted!')
-            return redirect(url_for('add_user'))
+            return redirect(url_for('main.add_user'))
         except:
             flash('Deleting Error')
-            return redirect(url_for('add_user'))
+            return redirect(url_for('main.add_user'))
     else:
         flash('permission denied')
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
 
-@app.route('/login', methods=['POST', 'GET'])
+@main.route('/login', methods=['POST', 'GET'])
+@rate_limited('username')
 def login():
+    from webforms import LoginForm
     form = LoginForm()
     if form.validate_on_submit():
-        user = Users.query.filter_by(username=form.username.data).first()
+        user = user_by_username(form.username.data).first()
         if user:
-            if check_password_hash(user.password_hash, form.password_hash.data):
+            if password_hasher.verify(user.password_hash, form.password_hash.data):
+                if password_hasher.needs_rehash(user.password_hash):
+                    user.password_hash = password_hasher.hash(form.password_hash.data)
+                    db.session.commit()
+                    user_cache.delete(user.id)
                 login_user(user)
+                cache_user(user)
                 flash('login success!')
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('main.dashboard'))
             else:
                 flash('wrong password')
         else:
@@ -217,58 +568,101 @@ def login():
     return render_template('login.html', form=form)
 
 
-@app.route('/logout', methods=['POST', 'GET'])
+@main.route('/logout', methods=['POST', 'GET'])
 @login_required
 def logout():
     logout_user()
     flash('you logout')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
+
+
+def cache_user(user):
+    """Store a detached copy of user's columns in user_cache."""
+    cached = Users(**{attr.key: getattr(user, attr.key)
+                      for attr in inspect(Users).column_attrs})
+    make_transient_to_detached(cached)
+    user_cache.set(user.id, cached)
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return Users.query.get(int(user_id))
+    user_id = int(user_id)
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        # Attach a copy to this request's session without a SELECT
+        return db.session.merge(cached, load=False)
+    user = db.session.get(Users, user_id)
+    if user is not None:
+        cache_user(user)
+    return user
+
+
+@main.route('/detail_post/<int:id>')
+@count_views
+@cached_page
+def detail_post(id):
+    post = db.get_or_404(Posts, id, options=[joinedload(Posts.poster)])
+    if post.slug:
+        # Not a 301: edit_post() can change the slug, and browsers would
+        # keep sending visitors to the old one
+        return redirect(post_url(post))
+    return render_template('detail_post.html', post=post)
 
 
-@app.route('/detail_post/<int:id>')
-def detail_post(id):
-    post = Posts.query.get_or_404(id)
+@main.route('/posts/<slug>')
+@count_views
+@cached_page
+def post(slug):
+    id = slug_map.get(slug)
+    post = db.session.get(Posts, id, options=[joinedload(Posts.poster)]) if id is not None else None
+    if post is None or post.slug != slug:
+        # Unknown here, or renamed by another process since the map was loaded
+        id = slug_map.lookup(slug)
+        if id is None:
+            abort(404)
+        post = db.session.get(Posts, id, options=[joinedload(Posts.poster)])
     return render_template('detail_post.html', post=post)
 
 
-@app.route('/add_post', methods=['POST', 'GET'])
+@main.route('/add_post', methods=['POST', 'GET'])
 @login_required
 def add_post():
+    from webforms import PostForm
     form = PostForm()
     if form.validate_on_submit():
         poster = current_user.id
         post = Posts(title=form.title.data,
-                     content=form.content.data,
-                     poster_id=poster,
-                     slug=form.slug.data)
-        db.session.add(post)
-        db.session.commit()
+                     poster_id=poster)
+        post.set_content(form.content.data)
+        save_post(post, form.slug.data or form.title.data)
+        slug_map.set(post.slug, post.id)
+        invalidate_pages()
         flash('OK')
-        return redirect(url_for('blog_posts'))
+        return redirect(url_for('main.blog_posts'))
 
-    return render_template('add_post.html', form=form,)
+    return render_template('add_post.html', form=form)
 
 
-@app.route('/posts/edit/<int:id>', methods=['GET', 'POST'])
+@main.route('/posts/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_post(id):
-    post = Posts.query.get_or_404(id)
+    post = db.get_or_404(Posts, id, options=[joinedload(Posts.poster)])
+    from webforms import PostForm
     form = PostForm()
     if form.validate_on_submit():
+        invalidate_post_fragments(post)
+        old_slug = post.slug
         post.title = form.title.data
         # post.author = form.author.data
-        post.slug = form.slug.data
-        post.content = form.content.data
+        post.set_content(form.content.data)
         # Update Database
-        db.session.add(post)
-        db.session.commit()
+        save_post(post, form.slug.data or form.title.data)
+        if post.slug != old_slug:
+            slug_map.discard(old_slug)
+            slug_map.set(post.slug, post.id)
+        invalidate_pages()
         flash("Post Has Been Updated!")
-        return redirect(url_for('blog_posts'))
+        return redirect(url_for('main.blog_posts'))
 
     if current_user.id == post.poster_id or current_user.id == 14:
         form.title.data = post.title
@@ -278,41 +672,75 @@ def edit_post(id):
         return render_template('edit_post.html', form=form)
     else:
         flash("You Aren't Authorized To Edit This Post...")
-        posts = Posts.query.order_by(Posts.date_posted)
-        return render_template("blog_posts.html", posts=posts)
+        return stream_page("blog_posts.html",
+                           posts=PostsPage(posts_with_posters()))
 
 
-@app.route('/blog_posts')
+@main.route('/blog_posts')
+@cached_page
 def blog_posts():
-    posts = Posts.query.order_by(Posts.date_posted.desc()).all()
-    return render_template('blog_posts.html', posts=posts)
-
-
-@app.route('/delete_post/<int:id>')
+    posts = PostsPage(posts_with_posters(),
+                      after=request.args.get('after'),
+                      before=request.args.get('before'),
+                      per_page=requested_per_page())
+    return stream_page('blog_posts.html',
+                       posts=posts,)
+
+
+@main.route('/most_viewed')
+@cached_page
+def most_viewed():
+    posts = most_viewed_posts(current_app.config['MOST_VIEWED_COUNT']).all()
+    return render_template('most_viewed.html', posts=posts)
+
+
+@main.route('/authors/<username>')
+@cached_page
+def author(username):
+    author = user_by_username(username).first_or_404()
+    per_page = requested_per_page()
+    posts, next_cursor, prev_cursor = paginate_posts(author_posts(author),
+                                                     after=request.args.get('after'),
+                                                     before=request.args.get('before'),
+                                                     per_page=per_page)
+    return render_template('author.html',
+                           author=author,
+                           posts=posts,
+                           per_page=per_page,
+                           next_cursor=next_cursor,
+                           prev_cursor=prev_cursor,)
+
+
+@main.route('/delete_post/<int:id>')
 def delete_post(id):
-    post = Posts.query.get_or_404(id)
+    post = db.get_or_404(Posts, id)
     id = current_user.id
     if id == post.poster.id:
 
         try:
+            invalidate_post_fragments(post)
+            slug = post.slug
             db.session.delete(post)
             db.session.commit()
+            slug_map.discard(slug)
+            invalidate_pages()
             flash('Delete ok')
-            return redirect(url_for('blog_posts'))
+            return redirect(url_for('main.blog_posts'))
         except:
             flash('Delete error')
-            return redirect(url_for('blog_posts'))
+            return redirect(url_for('main.blog_posts'))
     else:
         flash('Permission Denied')
-        return redirect(url_for('blog_posts'))
+        return redirect(url_for('main.blog_posts'))
 
 
-@app.route('/dashboard', methods=['POST', 'GET'])
+@main.route('/dashboard', methods=['POST', 'GET'])
 @login_required
 def dashboard():
+    from webforms import UserForm
     form = UserForm()
     id = current_user.id
-    name_to_update = Users.query.get_or_404(id)
+    name_to_update = current_user._get_current_object()
     if request.method == 'POST':
         name_to_update.name = request.form['name']
         name_to_update.email = request.form['email']
@@ -320,28 +748,36 @@ def dashboard():
         name_to_update.about_author = request.form['about_author']
         name_to_update.username = request.form['username']
 
-        if request.files['profile_pic']:
-            name_to_update.profile_pic = request.files['profile_pic']
-
-            pic_filename = secure_filename(name_to_update.profile_pic.filename)
+        upload = request.files.get('profile_pic')
+        if upload:
+            upload.stream.check()
+            pic_filename = secure_filename(upload.filename)
             pic_name = str(uuid.uuid1()) + '_' + pic_filename
 
-            saver = request.files['profile_pic']
             name_to_update.profile_pic = pic_name
+            name_to_update.profile_pic_small = None
+            name_to_update.profile_pic_large = None
             try:
                 db.session.commit()
-                saver.save(os.path.join(app.config['UPLOAD_FOLDER'], pic_name))
+                user_cache.delete(id)
+                invalidate_pages()
+                # Only move the streamed file into place once the row points at it
+                upload.stream.commit(os.path.join(current_app.config['UPLOAD_FOLDER'], pic_name))
+                image_pipeline.submit(id, pic_name)
                 flash('User Updated Successfully!')
                 return render_template('dashboard.html',
                                        form=form,
                                        name_to_update=name_to_update, )
             except:
+                db.session.rollback()
                 flash('Error Updating!')
                 return render_template('dashboard.html',
                                        form=form,
                                        name_to_update=name_to_update, )
         else:
             db.session.commit()
+            user_cache.delete(id)
+            invalidate_pages()
             flash('User Updated Successfully!')
             return render_template('dashboard.html',
                                    form=form,
@@ -353,67 +789,126 @@ def dashboard():
                                name_to_update=name_to_update, )
 
 
-@app.context_processor
-def base():
-    form = SearchForm()
-    return dict(form=form)
-
-
-@app.route('/search', methods=['POST'])
+@main.route('/search', methods=['GET', 'POST'])
 def search():
-    form = SearchForm()
-    posts = Posts.query
-    if form.validate_on_submit():
+    if request.method == 'POST':
+        from webforms import SearchForm
+        form = SearchForm()
+        if not form.validate_on_submit():
+            flash('Error Validation!')
+            return render_template('search.html', search=None)
         post_searched = form.searched.data
-        posts = posts.filter(or_(Posts.content.like('%' + post_searched + '%'),
-                                 Posts.title.like('%' + post_searched + '%')))
-        return render_template('search.html',
-                               form=form,
-                               searched=post_searched,
-                               posts=posts)
     else:
-        flash('Error Validation!')
-        return render_template('search.html')
-
-
-# MODELS
-class Users(db.Model, UserMixin):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(128), nullable=False, unique=True)
-    name = db.Column(db.String(200), nullable=False)
-    password_hash = db.Column(db.String(128))
-    email = db.Column(db.String(200), nullable=False, unique=True)
-    favorite_color = db.Column(db.String(120), default='Red')
-    # about_author = db.Column(db.String(500), nullable=True)
-    about_author = db.Column(db.Text(500), nullable=True)
-    created = db.Column(db.DateTime, default=datetime.utcnow)
-    profile_pic = db.Column(db.String(), nullable=True)
-    posts = db.relationship('Posts', backref='poster')
-
-
-class Posts(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(255))
-    content = db.Column(db.Text)
-    # author = db.Column(db.String(255))
-    date_posted = db.Column(db.DateTime, default=datetime.utcnow)
-    slug = db.Column(db.String(255))
-    poster_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-
-    @property
-    def password(self):
-        raise AttributeError('password is not a readable attribute!')
-
-    @password.setter
-    def password(self, password):
-        self.password_hash = generate_password_hash(password)
-
-    def verify_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
-    def __str__(self):
-        return f'{self.name}'
+        post_searched = request.args.get('searched', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    search = SearchPage(db.session, post_searched, page, current_app.config['SEARCH_RESULTS_PER_PAGE'])
+    return stream_page('search.html',
+                       searched=post_searched,
+                       search=search,
+                       results=search_results(search))
+
+
+def search_results(search):
+    """(post, snippet) for the hits of search, loaded in one query once the template gets there."""
+    posts_by_id = {post.id: post for post in
+                   posts_with_posters()
+                   .filter(Posts.id.in_([post_id for post_id, snippet in search.hits]))}
+    for post_id, snippet in search.hits:
+        if post_id in posts_by_id:
+            yield posts_by_id[post_id], snippet
+
+
+@main.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Rebuild the posts full-text index from the posts table."""
+    rebuild_index(db.session)
+    print('Search index rebuilt')
+
+
+@main.cli.command('generate-thumbnails')
+def generate_thumbnails():
+    """Queue thumbnail generation for profile pictures that have none."""
+    users = Users.query.filter(Users.profile_pic.isnot(None),
+                               Users.profile_pic_small.is_(None)).all()
+    for user in users:
+        image_pipeline.submit(user.id, user.profile_pic)
+    image_pipeline.join()
+    print(f'Processed {len(users)} profile pictures')
+
+
+@main.cli.command('backfill-post-content')
+@click.option('--batch-size', default=500, show_default=True)
+def backfill_post_content(batch_size):
+    """Sanitize existing posts and fill in content_text and excerpt."""
+    count = 0
+    last_id = 0
+    while True:
+        posts = Posts.query.filter(Posts.id > last_id).order_by(Posts.id).limit(batch_size).all()
+        if not posts:
+            break
+        for post in posts:
+            post.set_content(post.content)
+        db.session.commit()
+        fragment_cache.clear()
+        last_id = posts[-1].id
+        count += len(posts)
+    print(f'Backfilled {count} posts')
+
+
+@main.cli.command('import')
+@click.argument('kind', type=click.Choice(['users', 'posts']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(FORMATS), help='default: from the file extension')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--workers', type=int, help='hashing processes (default: PASSWORD_HASH_WORKERS)')
+@click.option('--restart', is_flag=True, help='ignore the checkpoint of an earlier run')
+def import_data(kind, path, format, batch_size, workers, restart):
+    """Import users or posts from a JSONL or CSV file.
+
+    Users need a username and email, and a plain text password or a
+    password_hash; posts need a title and name their author by username.
+    Progress is kept in PATH.checkpoint, a re-run resumes after the last
+    committed batch.
+    """
+    checkpoint = Checkpoint(path + '.checkpoint', path)
+    if restart:
+        checkpoint.clear()
+    importer = Importer(db.session, password_hasher.method,
+                        workers=workers or current_app.config['PASSWORD_HASH_WORKERS'],
+                        batch_size=batch_size)
+    format = format or guess_format(path)
+    with open(path, newline='' if format == 'csv' else None, encoding='utf-8') as f:
+        try:
+            skip = checkpoint.load()
+            if skip:
+                print(f'Resuming after {skip} records')
+            read, inserted = importer.run(kind, read_records(f, format), skip=skip, on_commit=checkpoint.save)
+        except ValueError as e:
+            db.session.rollback()
+            raise SystemExit(f'Import stopped: {e}')
+    checkpoint.clear()
+    print(f'Imported {inserted} {kind} from {read - skip} records, '
+          f'{read - skip - inserted} already existed')
+
+
+@main.cli.command('export')
+@click.argument('kind', type=click.Choice(['users', 'posts']))
+@click.argument('path', default='-')
+@click.option('--format', type=click.Choice(FORMATS), help='default: from the file extension, else jsonl')
+@click.option('--with-password-hashes', is_flag=True, help='include users\' password hashes')
+@click.option('--batch-size', default=1000, show_default=True)
+def export_data(kind, path, format, with_password_hashes, batch_size):
+    """Export every user or post to a JSONL or CSV file, or stdout."""
+    format = format or guess_format(path)
+    fields, rows = export_rows(db.session, kind, with_password_hashes, batch_size)
+    f = open_output(path, format)
+    try:
+        count = write_records(f, format, fields, rows)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    print(f'Exported {count} {kind}', file=sys.stderr)
 
 
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
@@ -0,0 +1,147 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Text assets worth precompressing; images are already compressed
+COMPRESSIBLE = {'.css', '.js', '.svg', '.html', '.txt', '.json', '.xml', '.map'}
+FINGERPRINT = re.compile(r'^(?P<root>.+)\.(?P<digest>[0-9a-f]{12})(?P<ext>\.[^.]*)?$')
+ONE_YEAR = 365 * 24 * 60 * 60
+# Precompressed sibling suffix per Content-Encoding, in order of preference
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def fingerprint(filename, digest):
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{digest}{ext}'
+
+
+class StaticAssets:
+    """Serve static files under content-hashed URLs.
+
+    url_for('static', filename='css/style.css') becomes
+    /static/css/style.<hash>.css, served with a strong ETag and a one year
+    immutable Cache-Control. .br/.gz siblings written by
+    `flask build-assets` are sent to clients that accept them. Files in
+    UPLOAD_FOLDER aren't hashed at startup, only once a URL asks for them.
+    """
+
+    def __init__(self, app=None):
+        self.digests = {}
+        self.uploads = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.static_folder
+        if app.config.get('UPLOAD_FOLDER'):
+            self.uploads = os.path.realpath(app.config['UPLOAD_FOLDER'])
+        self.scan()
+        app.url_defaults(self.fingerprint_url)
+        app.view_functions['static'] = self.send_static_file
+        app.extensions['static_assets'] = self
+
+        @app.cli.command('build-assets')
+        def build_assets():
+            """Write precompressed .gz/.br siblings of text assets."""
+            count = self.precompress()
+            print(f'Precompressed {count} static files')
+
+    def walk(self):
+        for dirpath, dirnames, filenames in os.walk(self.folder):
+            # User content grows without bound, leave it to digest()
+            dirnames[:] = [name for name in dirnames
+                           if os.path.realpath(os.path.join(dirpath, name)) != self.uploads]
+            for name in filenames:
+                if name.startswith('.') or name.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, self.folder).replace(os.sep, '/'), path
+
+    def scan(self):
+        self.digests = {filename: file_digest(path) for filename, path in self.walk()}
+
+    def path(self, filename):
+        """Real path of filename if it's a file inside the static folder, else None."""
+        path = safe_join(self.folder, filename)
+        if path is None:
+            return None
+        path = os.path.realpath(path)
+        if not path.startswith(os.path.realpath(self.folder) + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def digest(self, filename):
+        """Content hash of a static file, hashing files added since startup."""
+        digest = self.digests.get(filename)
+        if digest is None:
+            path = self.path(filename)
+            if path is None:
+                return None
+            digest = self.digests[filename] = file_digest(path)
+        return digest
+
+    def fingerprint_url(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            digest = self.digest(values['filename'])
+            if digest is not None:
+                values['filename'] = fingerprint(values['filename'], digest)
+
+    def precompress(self):
+        count = 0
+        for filename, path in self.walk():
+            if os.path.splitext(filename)[1] not in COMPRESSIBLE:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data))
+            count += 1
+        return count
+
+    def send_static_file(self, filename):
+        digest = None
+        match = FINGERPRINT.match(filename)
+        if match and self.digest(match['root'] + (match['ext'] or '')) == match['digest']:
+            digest = match['digest']
+            filename = match['root'] + (match['ext'] or '')
+
+        path = self.path(filename)
+        if path is None:
+            abort(404)
+
+        encoding = None
+        for candidate in ENCODINGS:
+            if candidate in request.accept_encodings and os.path.isfile(path + ENCODINGS[candidate]):
+                encoding = candidate
+                break
+
+        response = send_file(path + ENCODINGS[encoding] if encoding else path,
+                             mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                             etag=True if digest is None else '-'.join(filter(None, (digest, encoding))),
+                             max_age=None if digest is None else ONE_YEAR,
+                             conditional=True)
+        if digest is not None:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,58 @@
+"""Report password verifications (logins) per second per core for each cost setting.
+
+Usage: python benchmarks/password_hashing.py [--seconds 2]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hashers import PasswordHasher  # noqa: E402
+
+SETTINGS = [
+    ('pbkdf2:sha256', 100000),
+    ('pbkdf2:sha256', 300000),
+    ('pbkdf2:sha256', 600000),
+    ('scrypt', 16384),
+    ('scrypt', 32768),
+]
+
+
+def logins_per_second(hasher, pwhash, seconds, threads):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+
+    def worker():
+        n = 0
+        while time.perf_counter() < deadline:
+            hasher.verify(pwhash, 'correct horse battery staple')
+            n += 1
+        return n
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for n in pool.map(lambda _: worker(), range(threads)):
+            count += n
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+    cores = os.cpu_count()
+
+    print(f'{"method":<16}{"cost":>10}{"ms/hash":>10}{"logins/s/core":>16}{"logins/s":>12}')
+    for method, cost in SETTINGS:
+        hasher = PasswordHasher(method, cost, workers=cores)
+        pwhash = hasher.hash('correct horse battery staple')
+        single = logins_per_second(hasher, pwhash, args.seconds, threads=1)
+        total = logins_per_second(hasher, pwhash, args.seconds, threads=cores * 2)
+        print(f'{method:<16}{cost:>10}{1000 / single:>10.1f}{single:>16.1f}{total:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""Latency, throughput and queries per request of the main routes.
+
+Seeds a database with --users users and --posts posts (skipped if it
+already has users), then drives /blog_posts, /search, /posts/<slug>,
+/login and /dashboard first through the Flask test client, one request at
+a time, and then through a threaded WSGI server with --threads concurrent
+HTTP clients. Prints p50/p95/p99 latency, requests per second and SQL
+queries per request for each, and writes them to --output as JSON so runs
+can be compared across commits.
+
+The full page cache is off unless --page-cache is given, so anonymous
+pages measure rendering rather than cache lookups. Responses are only
+compressed for an --accept-encoding such as gzip.
+
+Usage: python benchmarks/routes.py [--users 1000] [--posts 100000] [--requests 200]
+                                   [--threads 8] [--database bench.db] [--accept-encoding gzip]
+                                   [--output routes.json]
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from sqlalchemy import func, insert
+from werkzeug.serving import make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app, instrumentation, password_hasher  # noqa: E402
+from config import Config  # noqa: E402
+from models import db, Users, Posts  # noqa: E402
+from search import create_index  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+WORDS = ('flask', 'python', 'sqlite', 'cache', 'query', 'index', 'template', 'server',
+         'worker', 'thread', 'latency', 'profile', 'session', 'upload', 'search', 'render',
+         'keyset', 'cursor', 'migration', 'engine', 'pool', 'request', 'response', 'header')
+SCENARIOS = ('blog_posts', 'search', 'detail_post', 'login', 'dashboard')
+# View function of each scenario, for the query counts
+ENDPOINTS = {'blog_posts': 'main.blog_posts',
+             'search': 'main.search',
+             'detail_post': 'main.post',
+             'login': 'main.login',
+             'dashboard': 'main.dashboard'}
+
+
+def make_config(args):
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.abspath(args.database)}'
+        WTF_CSRF_ENABLED = False
+        PASSWORD_HASH_COST = args.hash_cost or Config.PASSWORD_HASH_COST
+        INSTRUMENTATION_ENABLED = True
+        PROFILE_SAMPLE_RATE = 0.0
+        PAGE_CACHE_SIZE = Config.PAGE_CACHE_SIZE if args.page_cache else 0
+        # The login scenario is one client posting as fast as it can
+        RATE_LIMIT_ENABLED = False
+    return BenchmarkConfig
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(app, users, posts, batch_size=5000):
+    """Create the schema and fill it in, unless the database already has users."""
+    with app.app_context():
+        db.create_all()
+        create_index(db.session)
+        if db.session.query(Users.id).first() is not None:
+            return
+        rng = random.Random(0)
+        # One hash for everyone: hashing every user at the real cost takes minutes
+        pwhash = password_hasher.hash(PASSWORD)
+        db.session.execute(insert(Users), [{'username': f'user{i}',
+                                            'name': f'User {i}',
+                                            'email': f'user{i}@example.com',
+                                            'password_hash': pwhash,
+                                            'about_author': sentence(rng, 20)}
+                                           for i in range(users)])
+        user_ids = [id for id, in db.session.query(Users.id)]
+        start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=posts)
+        for offset in range(0, posts, batch_size):
+            rows = []
+            for i in range(offset, min(offset + batch_size, posts)):
+                text = sentence(rng, 120)
+                rows.append({'title': sentence(rng, 5).title(),
+                             'content': f'<p>{text}</p>',
+                             'content_text': text,
+                             'excerpt': text[:300],
+                             'slug': f'post-{i}',
+                             'date_posted': start + timedelta(minutes=i),
+                             'poster_id': rng.choice(user_ids)})
+            db.session.execute(insert(Posts), rows)
+        db.session.commit()
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1] * 1000, 2)
+
+
+def summarize(latencies, errors, elapsed, queries):
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {'requests': len(latencies),
+            'errors': errors,
+            'p50_ms': percentile(quantiles, 50),
+            'p95_ms': percentile(quantiles, 95),
+            'p99_ms': percentile(quantiles, 99),
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'queries_per_request': round(queries / len(latencies), 2)}
+
+
+def sql_queries(endpoint):
+    stats = instrumentation.snapshot().get(endpoint)
+    return stats.sql_count if stats is not None else 0
+
+
+class Requests:
+    """Build the (method, path, form) of the next request of each scenario."""
+
+    def __init__(self, app, seed=1):
+        self.rng = random.Random(seed)
+        with app.app_context():
+            self.max_post_id = db.session.query(func.max(Posts.id)).scalar()
+            self.max_user_id = db.session.query(func.max(Users.id)).scalar()
+
+    def __call__(self, scenario):
+        if scenario == 'blog_posts':
+            return 'GET', '/blog_posts', None
+        if scenario == 'search':
+            return 'GET', '/search?' + urlencode({'searched': self.rng.choice(WORDS)}), None
+        if scenario == 'detail_post':
+            return 'GET', f'/posts/post-{self.rng.randrange(self.max_post_id)}', None
+        if scenario == 'login':
+            return 'POST', '/login', {'username': f'user{self.rng.randrange(self.max_user_id)}',
+                                      'password_hash': PASSWORD}
+        return 'GET', '/dashboard', None
+
+
+def run_test_client(app, scenario, count, headers):
+    requests = Requests(app)
+    client = app.test_client()
+    if scenario == 'dashboard':
+        client.post('/login', data={'username': 'user0', 'password_hash': PASSWORD})
+    instrumentation.reset()
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        method, path, form = requests(scenario)
+        begin = time.perf_counter()
+        response = client.open(path, method=method, data=form, headers=headers)
+        # Streamed pages only render, and release their session, as they're read
+        response.get_data()
+        response.close()
+        latencies.append(time.perf_counter() - begin)
+        errors += response.status_code >= 400
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed, sql_queries(ENDPOINTS[scenario]))
+
+
+def http_request(port, method, path, form=None, cookie=None, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = dict(headers or {})
+    if cookie:
+        headers['Cookie'] = cookie
+    body = None
+    if form is not None:
+        body = urlencode(form)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response
+    finally:
+        conn.close()
+
+
+def login_cookie(port):
+    response = http_request(port, 'POST', '/login', {'username': 'user0', 'password_hash': PASSWORD})
+    cookie = SimpleCookie()
+    for header in response.headers.get_all('Set-Cookie') or ():
+        cookie.load(header)
+    return '; '.join(f'{name}={morsel.value}' for name, morsel in cookie.items())
+
+
+def run_server(app, port, scenario, count, threads, headers):
+    cookie = login_cookie(port) if scenario == 'dashboard' else None
+    instrumentation.reset()
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = iter(range(count))
+
+    def worker(seed):
+        nonlocal errors
+        requests = Requests(app, seed)
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            method, path, form = requests(scenario)
+            begin = time.perf_counter()
+            try:
+                status = http_request(port, method, path, form, cookie, headers).status
+            except OSError:
+                status = 599
+            elapsed = time.perf_counter() - begin
+            with lock:
+                latencies.append(elapsed)
+                errors += status >= 400
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed, sql_queries(ENDPOINTS[scenario]))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario and driver')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--database', help='SQLite file to seed or reuse (default: a temporary file)')
+    parser.add_argument('--hash-cost', type=int, help='password hash cost (default: PASSWORD_HASH_COST)')
+    parser.add_argument('--page-cache', action='store_true', help='leave the full page cache on')
+    parser.add_argument('--accept-encoding', help='Accept-Encoding header to send, e.g. gzip')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+    if args.database is None:
+        args.database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    app = create_app(make_config(args))
+    start = time.perf_counter()
+    seed(app, args.users, args.posts)
+    print(f'Database {args.database} ready in {time.perf_counter() - start:.1f}s')
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    headers = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else {}
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    results = {'commit': git_commit(),
+               'python': platform.python_version(),
+               'date': datetime.now(timezone.utc).isoformat(),
+               'settings': {key: value for key, value in vars(args).items() if key != 'output'},
+               'test_client': {},
+               'server': {}}
+    print(f'{"driver":<12}{"route":<14}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+          f'{"req/s":>9}{"queries":>9}{"errors":>8}')
+    for driver in ('test_client', 'server'):
+        for scenario in args.scenarios:
+            if driver == 'test_client':
+                result = run_test_client(app, scenario, args.requests, headers)
+            else:
+                result = run_server(app, server.server_port, scenario, args.requests, args.threads, headers)
+            results[driver][scenario] = result
+            print(f'{driver:<12}{scenario:<14}{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+                  f'{result["p99_ms"]:>9}{result["requests_per_second"]:>9}'
+                  f'{result["queries_per_request"]:>9}{result["errors"]:>8}')
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Mixed read/write throughput of SQLite with default vs tuned engine settings.
+
+Each run starts a fresh database with --posts rows, then --threads threads
+loop for --seconds: a fraction --write-ratio of operations insert a post and
+commit, the rest read a page of posts the way /blog_posts does.
+
+Usage: python benchmarks/sqlite_concurrency.py [--threads 8] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import apply_sqlite_pragmas, engine_options  # noqa: E402
+
+
+def make_engine(path, tuned):
+    uri = f'sqlite:///{path}'
+    if not tuned:
+        return create_engine(uri)
+    engine = create_engine(uri, **engine_options(uri, pool_size=20, max_overflow=0))
+    apply_sqlite_pragmas(engine)
+    return engine
+
+
+def seed(engine, posts):
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE posts (id INTEGER PRIMARY KEY, title VARCHAR(255), '
+                          'content TEXT, date_posted DATETIME, poster_id INTEGER)'))
+        conn.execute(text('CREATE INDEX ix_posts_date_posted ON posts (date_posted)'))
+        conn.execute(text("INSERT INTO posts (title, content, date_posted, poster_id) "
+                          "VALUES (:title, :content, datetime('now'), 1)"),
+                     [{'title': f'post {i}', 'content': 'lorem ipsum ' * 50} for i in range(posts)])
+
+
+def run(tuned, args):
+    folder = tempfile.mkdtemp()
+    engine = make_engine(os.path.join(folder, 'bench.db'), tuned)
+    seed(engine, args.posts)
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def worker():
+        reads = writes = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                if random.random() < args.write_ratio:
+                    with engine.begin() as conn:
+                        conn.execute(text("INSERT INTO posts (title, content, date_posted, poster_id) "
+                                          "VALUES ('new', 'body', datetime('now'), 1)"))
+                    writes += 1
+                else:
+                    with engine.connect() as conn:
+                        conn.execute(text('SELECT * FROM posts ORDER BY date_posted DESC, id DESC '
+                                          'LIMIT 10')).all()
+                    reads += 1
+            except OperationalError:
+                # 'database is locked'
+                errors += 1
+        with lock:
+            counts['reads'] += reads
+            counts['writes'] += writes
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return {name: value / elapsed for name, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(f'{args.threads} threads, {args.write_ratio:.0%} writes, {args.posts} posts')
+    print(f'{"engine":<10}{"reads/s":>12}{"writes/s":>12}{"errors/s":>12}')
+    for name, tuned in (('default', False), ('tuned', True)):
+        result = run(tuned, args)
+        print(f'{name:<10}{result["reads"]:>12.1f}{result["writes"]:>12.1f}{result["errors"]:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Cold-start time of the app: python -X importtime report plus create_app() wall time.
+
+Runs `from app import create_app; create_app()` in fresh interpreters,
+prints the slowest top-level imports and the median cold start, and exits
+with status 1 if the median is over the budget.
+
+Usage: python benchmarks/startup_time.py [--runs 5] [--budget-ms 300] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Target cold start (interpreter + imports + create_app) for a worker spawn
+COLD_START_BUDGET_MS = 300
+
+STARTUP = ('import time; start = time.perf_counter(); '
+           'from app import create_app; create_app(); '
+           'print((time.perf_counter() - start) * 1000)')
+
+
+def importtime_report():
+    """[(cumulative us, self us, module)] for modules imported by app code."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', STARTUP],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Two levels of nesting: app's own modules and what they import directly
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 2:
+            rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return rows
+
+
+def cold_start_ms():
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-c', STARTUP],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=COLD_START_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    print(f'{"cumulative ms":>14}{"self ms":>10}  module')
+    for cumulative_us, self_us, name in sorted(importtime_report(), reverse=True)[:args.top]:
+        print(f'{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}')
+
+    timings = [cold_start_ms() for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print(f'\nimport + create_app(): median {median:.1f} ms over {args.runs} runs '
+          f'(min {min(timings):.1f}, max {max(timings):.1f}), budget {args.budget_ms:.0f} ms')
+    if median > args.budget_ms:
+        print('OVER BUDGET')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
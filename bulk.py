@@ -0,0 +1,255 @@
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from werkzeug.security import generate_password_hash
+
+from content import prepare_content
+from models import Users, Posts
+from slugs import slugify
+
+FORMATS = ('jsonl', 'csv')
+# Exported columns; ids aren't portable between databases, posts name
+# their author by username instead
+USER_FIELDS = ('username', 'name', 'email', 'favorite_color', 'about_author', 'created')
+POST_FIELDS = ('title', 'slug', 'content', 'date_posted', 'author', 'views')
+
+
+def guess_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def parse_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def read_records(f, format):
+    """Dicts from a JSONL or CSV file, one per line or row, as they are read.
+
+    Empty CSV cells are read as None, like JSON nulls.
+    """
+    if format == 'csv':
+        for row in csv.DictReader(f):
+            yield {key: None if value == '' else value for key, value in row.items()}
+    else:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_records(f, format, fields, rows):
+    """Write rows (mappings) to f as JSONL or CSV; returns how many."""
+    count = 0
+    if format == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(['' if row[field] is None
+                             else row[field].isoformat() if isinstance(row[field], datetime)
+                             else row[field]
+                             for field in fields])
+            count += 1
+    else:
+        for row in rows:
+            f.write(json.dumps({field: row[field] for field in fields}, default=datetime.isoformat) + '\n')
+            count += 1
+    return count
+
+
+def batches(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+class Checkpoint:
+    """How many records of an input file are already imported.
+
+    Saved after every committed batch, so an import that stops part way
+    picks up after the last batch it committed.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        if state.get('source') != self.source:
+            raise ValueError(f'{self.path} is the checkpoint of {state.get("source")}, not {self.source}')
+        return state['records']
+
+    def save(self, records):
+        # Written aside and renamed, so a crash never leaves half a checkpoint
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump({'source': self.source, 'records': records}, f)
+        os.replace(self.path + '.tmp', self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class Importer:
+    """Insert users or posts from records in batches, one transaction each.
+
+    Password hashing (users) and HTML sanitizing (posts) are CPU bound and
+    run in a pool of `workers` processes. The pool works on the next batch
+    while the current one is inserted with a single executemany INSERT.
+    Users whose username or email is taken are skipped, so re-running an
+    import doesn't duplicate them. Post slugs are normalized the way
+    save_post() does it, taken ones getting a -2, -3, ... suffix; it's the
+    checkpoint that keeps a resumed posts import from adding them twice.
+    The post count and search index triggers keep up as rows go in.
+    """
+
+    def __init__(self, session, hash_method, workers=None, batch_size=1000):
+        self.session = session
+        self.hash_method = hash_method
+        self.workers = workers or os.cpu_count()
+        self.batch_size = batch_size
+
+    def run(self, kind, records, skip=0, on_commit=None):
+        """Import records after the first skip; returns (records read, rows inserted).
+
+        on_commit(records read so far) runs after every batch is committed.
+        """
+        prepare, insert_rows = {'users': (self.prepare_users, self.insert_users),
+                                'posts': (self.prepare_posts, self.insert_posts)}[kind]
+        done = skip
+        inserted = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = None
+            for batch in batches(islice(records, skip, None), self.batch_size):
+                prepared = prepare(pool, batch, done + (len(pending[0]) if pending else 0))
+                if pending is not None:
+                    inserted += insert_rows(*pending)
+                    done += len(pending[0])
+                    if on_commit is not None:
+                        on_commit(done)
+                pending = batch, prepared
+            if pending is not None:
+                inserted += insert_rows(*pending)
+                done += len(pending[0])
+                if on_commit is not None:
+                    on_commit(done)
+        return done, inserted
+
+    def map(self, pool, function, *iterables):
+        chunksize = max(1, self.batch_size // (self.workers * 4))
+        return pool.map(function, *iterables, chunksize=chunksize)
+
+    def prepare_users(self, pool, batch, offset):
+        for n, record in enumerate(batch, offset + 1):
+            missing = [field for field in ('username', 'email') if not record.get(field)]
+            if missing:
+                raise ValueError(f'Record {n} has no {" or ".join(missing)}')
+        passwords = [record['password'] for record in batch
+                     if record.get('password') and not record.get('password_hash')]
+        return self.map(pool, generate_password_hash, passwords, [self.hash_method] * len(passwords))
+
+    def insert_users(self, batch, hashes):
+        now = datetime.utcnow()
+        rows = []
+        for record in batch:
+            password_hash = record.get('password_hash')
+            if not password_hash and record.get('password'):
+                password_hash = next(hashes)
+            rows.append({'username': record['username'],
+                         'name': record.get('name') or record['username'],
+                         'email': record['email'],
+                         'favorite_color': record.get('favorite_color', Users.favorite_color.default.arg),
+                         'about_author': record.get('about_author'),
+                         'created': parse_datetime(record.get('created')) or now,
+                         'password_hash': password_hash})
+        return self.execute(insert(Users.__table__).on_conflict_do_nothing(), rows)
+
+    def prepare_posts(self, pool, batch, offset):
+        for n, record in enumerate(batch, offset + 1):
+            if not record.get('title'):
+                raise ValueError(f'Record {n} has no title')
+        return self.map(pool, prepare_content, [record.get('content') or '' for record in batch])
+
+    def insert_posts(self, batch, contents):
+        authors = {record['author'] for record in batch if record.get('author')}
+        poster_ids = dict(self.session.execute(select(Users.username, Users.id)
+                                               .where(Users.username.in_(authors))).all())
+        unknown = authors - poster_ids.keys()
+        if unknown:
+            raise ValueError(f'Unknown authors: {", ".join(sorted(unknown))}')
+        now = datetime.utcnow()
+        rows = []
+        for record, (content, content_text, excerpt) in zip(batch, contents):
+            rows.append({'title': record['title'],
+                         # Without one, the post is served at /detail_post/<id>
+                         'slug': record.get('slug'),
+                         'content': content,
+                         'content_text': content_text,
+                         'excerpt': excerpt,
+                         'date_posted': parse_datetime(record.get('date_posted')) or now,
+                         'poster_id': poster_ids.get(record.get('author')),
+                         'views': int(record.get('views') or 0)})
+        self.assign_slugs(rows)
+        return self.execute(insert(Posts.__table__).on_conflict_do_nothing(), rows)
+
+    def assign_slugs(self, rows):
+        """slugify() each row's slug, blank ones to NULL, suffixing taken ones like unique_slug()."""
+        for row in rows:
+            row['slug'] = slugify(row['slug']) if (row['slug'] or '').strip() else None
+        bases = {row['slug'] for row in rows if row['slug']}
+        taken = set(self.session.scalars(select(Posts.slug).where(Posts.slug.in_(bases))))
+        # Suffixed slugs of a base are only read once one of its rows needs one
+        suffixed = set()
+        assigned = set()
+        for row in rows:
+            base = row['slug']
+            if base is None:
+                continue
+            if base in taken or base in assigned:
+                if base not in suffixed:
+                    taken.update(self.session.scalars(select(Posts.slug).where(Posts.slug.like(f'{base}-%'))))
+                    suffixed.add(base)
+                n = 2
+                while f'{base}-{n}' in taken or f'{base}-{n}' in assigned:
+                    n += 1
+                row['slug'] = f'{base}-{n}'
+            assigned.add(row['slug'])
+
+    def execute(self, statement, rows):
+        result = self.session.execute(statement, rows)
+        self.session.commit()
+        return result.rowcount
+
+
+def export_rows(session, kind, with_password_hashes=False, batch_size=1000):
+    """(fields, rows) of every user or post in id order, read from the cursor in batches."""
+    if kind == 'users':
+        fields = USER_FIELDS + (('password_hash',) if with_password_hashes else ())
+        statement = select(*(getattr(Users, field) for field in fields)).order_by(Users.id)
+    else:
+        fields = POST_FIELDS
+        statement = select(Posts.title, Posts.slug, Posts.content, Posts.date_posted,
+                           Users.username.label('author'), Posts.views) \
+            .outerjoin(Users, Posts.poster_id == Users.id).order_by(Posts.id)
+    result = session.execute(statement.execution_options(yield_per=batch_size))
+    return fields, result.mappings()
+
+
+def open_output(path, format):
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', newline='' if format == 'csv' else None, encoding='utf-8')
@@ -0,0 +1,115 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with an optional TTL per entry.
+
+    max_memory, if set, also caps the total sys.getsizeof() of the values.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, max_memory=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_memory = max_memory
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expires)
+            self.memory += sys.getsizeof(value)
+            while self._data and (len(self._data) > self.maxsize or
+                                  (self.max_memory and self.memory > self.max_memory)):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.memory = 0
+
+    def _pop(self, key):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.memory -= sys.getsizeof(item[0])
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'memory': self.memory,
+                'hit_rate': self.hits / total if total else 0.0}
+
+
+class RedisCache:
+    """Cache backend with the LRUCache interface, stored in Redis.
+
+    Lets several worker processes share entries. Eviction is left to the
+    Redis maxmemory policy; values must be str or bytes.
+    """
+
+    def __init__(self, url, ttl=None, prefix=''):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def _key(self, key):
+        if isinstance(key, tuple):
+            key = ':'.join(map(str, key))
+        return f'{self.prefix}{key}'
+
+    def get(self, key, default=None):
+        value = self._redis.get(self._key(key))
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._redis.set(self._key(key), value, ex=self.ttl)
+
+    def delete(self, key):
+        self._redis.delete(self._key(key))
+
+    def clear(self):
+        for key in self._redis.scan_iter(f'{self.prefix}*'):
+            self._redis.delete(key)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0}
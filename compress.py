@@ -0,0 +1,186 @@
+import zlib
+from functools import lru_cache
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_set_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content types worth compressing; images, fonts and archives already are
+COMPRESSIBLE_TYPES = {'application/json', 'application/javascript', 'application/xml',
+                      'application/rss+xml', 'application/atom+xml', 'image/svg+xml'}
+# Statuses that carry no body, or a byte range of the uncompressed one
+UNCOMPRESSED_STATUSES = {'204', '206', '304'}
+
+
+class GzipEncoder:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Incremental encoder per Content-Encoding, in order of preference
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdEncoder
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder
+ENCODERS['gzip'] = GzipEncoder
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding, encodings=tuple(ENCODERS)):
+    """The encoding in encodings the client rates highest, ties going to the earlier one."""
+    if not accept_encoding:
+        return None
+    accept = parse_accept_header(accept_encoding)
+    best = None
+    best_quality = 0
+    for encoding in encodings:
+        quality = accept.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compressible(mimetype):
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """Compress responses with gzip, brotli or zstd as the client accepts.
+
+    Bodies are compressed chunk by chunk and each chunk is flushed, so a
+    streamed page still reaches the client as it renders. Responses that
+    are already encoded, aren't text, or are shorter than min_size are
+    passed through untouched. levels maps each encoding to its level.
+
+    Views can compress a body themselves with compress() (see
+    cached_page()) and set Content-Encoding; this leaves those alone.
+    """
+
+    def __init__(self, app, min_size=1024, levels=None):
+        self.app = app
+        self.min_size = min_size
+        self.levels = levels or {}
+        self.encodings = tuple(ENCODERS)
+
+    def negotiate(self, accept_encoding):
+        return negotiate(accept_encoding, self.encodings)
+
+    def encoder(self, encoding, level=None):
+        return ENCODERS[encoding](level if level is not None else self.levels[encoding])
+
+    def compress(self, data, encoding, level=None):
+        encoder = self.encoder(encoding, level)
+        return encoder.compress(data) + encoder.finish()
+
+    def __call__(self, environ, start_response):
+        captured = []
+        passthrough = False
+
+        def capture(status, headers, exc_info=None):
+            if passthrough:
+                return start_response(status, headers, exc_info)
+            captured[:] = [status, headers, exc_info]
+            return self.write
+
+        body = self.app(environ, capture)
+        if not captured:
+            # The app calls start_response() as its body is iterated
+            passthrough = True
+            return body
+
+        status, headers, exc_info = captured
+        headers = Headers(headers)
+        mimetype = headers.get('Content-Type', '').partition(';')[0].strip().lower()
+        if (status[:3] in UNCOMPRESSED_STATUSES or not compressible(mimetype)
+                or 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', '')):
+            start_response(status, captured[1], exc_info)
+            return body
+
+        # The response depends on Accept-Encoding whether or not this client gets it compressed
+        vary = parse_set_header(headers.get('Vary'))
+        if 'accept-encoding' not in vary and '*' not in vary:
+            vary.add('Accept-Encoding')
+            headers['Vary'] = vary.to_header()
+
+        encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        length = headers.get('Content-Length', type=int)
+        if encoding is None or environ['REQUEST_METHOD'] == 'HEAD' or (length is not None
+                                                                       and length < self.min_size):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+        return ClosingIterator(self.encode(body, encoding, status, headers, exc_info, start_response),
+                               getattr(body, 'close', None))
+
+    def encode(self, body, encoding, status, headers, exc_info, start_response):
+        chunks = iter(body)
+        # A streamed body has no Content-Length: read enough of it to
+        # know it's worth compressing before sending the headers
+        head = []
+        size = 0
+        for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size >= self.min_size:
+                break
+        if size < self.min_size:
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            yield b''.join(head)
+            return
+
+        del headers['Content-Length']
+        headers['Content-Encoding'] = encoding
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            # The bytes differ from the uncompressed ones
+            headers['ETag'] = f'W/{etag}'
+        start_response(status, headers.to_wsgi_list(), exc_info)
+
+        encoder = self.encoder(encoding)
+        yield encoder.compress(b''.join(head))
+        for chunk in chunks:
+            if chunk:
+                yield encoder.compress(chunk)
+        yield encoder.finish()
+
+    @staticmethod
+    def write(data):
+        raise RuntimeError('CompressionMiddleware does not support the start_response() write callable')
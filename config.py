@@ -0,0 +1,105 @@
+import os
+
+from database import SQLITE_PRAGMAS
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', "my super secret key that no one is supposed to know")
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///user.db')
+    SQLITE_PRAGMAS = SQLITE_PRAGMAS
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+
+    UPLOAD_FOLDER = 'static/images'
+    MAX_CONTENT_LENGTH = 8 * 1024 * 1024
+    MAX_UPLOAD_FILE_SIZE = 5 * 1024 * 1024
+
+    # Pagination
+    POSTS_PER_PAGE = 10
+    SEARCH_RESULTS_PER_PAGE = 10
+
+    # Logged-in user cache
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 60
+
+    # Password hashing: method is one of hashers.METHODS, cost is the pbkdf2
+    # iteration count or the scrypt N parameter
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256'
+    PASSWORD_HASH_COST = 600000
+    PASSWORD_HASH_WORKERS = os.cpu_count()
+
+    # Rendered post fragments: 'memory' (per process) or 'redis' (shared)
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND', 'memory')
+    FRAGMENT_CACHE_SIZE = 10000
+    FRAGMENT_CACHE_MAX_MEMORY = 64 * 1024 * 1024
+    FRAGMENT_CACHE_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+    # Full pages served to anonymous visitors, see cached_page(). The TTL
+    # bounds how long other worker processes may serve a page after a write
+    PAGE_CACHE_SIZE = 1000
+    PAGE_CACHE_MAX_MEMORY = 32 * 1024 * 1024
+    PAGE_CACHE_TTL = 60
+    # Larger streamed pages are sent but not kept
+    PAGE_CACHE_MAX_ENTRY = 1024 * 1024
+
+    # Streamed pages go out in writes of about this many characters
+    STREAM_BUFFER_SIZE = 4096
+
+    # Responses are compressed with zstd, brotli or gzip, whichever the
+    # client accepts and is installed, see compress.CompressionMiddleware.
+    # Cached pages are compressed once, so they can afford higher levels
+    COMPRESSION_MIN_SIZE = 1024
+    COMPRESSION_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+    COMPRESSION_CACHED_LEVELS = {'zstd': 12, 'br': 9, 'gzip': 9}
+
+    # POSTs to /login and /test_pw allowed per client IP and per username
+    # (or email), as (requests, seconds); more get a 429 before any query or
+    # password hash runs. The 'memory' backend counts per process, 'sqlite'
+    # shares the counts between the processes of one host through
+    # RATE_LIMIT_DATABASE, relative to the instance folder
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_DATABASE = os.environ.get('RATE_LIMIT_DATABASE', 'ratelimit.db')
+    RATE_LIMIT_PER_IP = (30, 60)
+    RATE_LIMIT_PER_USERNAME = (5, 60)
+    RATE_LIMIT_MAX_KEYS = 100000
+
+    # Post views are buffered in memory and written every interval seconds,
+    # or once this many are waiting, see counters.WriteBehindCounter
+    VIEW_COUNTER_FLUSH_INTERVAL = 10
+    VIEW_COUNTER_MAX_PENDING = 1000
+    MOST_VIEWED_COUNT = 10
+
+    # Per endpoint timings and SQL counts at /metrics and /admin/metrics;
+    # PROFILE_SAMPLE_RATE is the fraction of requests run under cProfile
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED') == '1'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.01))
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    WTF_CSRF_ENABLED = False
+    PASSWORD_HASH_COST = 1000
+
+
+class ProductionConfig(Config):
+    # Must come from the environment, create_app() refuses to start without it
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+}
+
+
+def get_config(name=None):
+    """Config class for name, or for the FLASKER_CONFIG environment variable."""
+    name = name or os.environ.get('FLASKER_CONFIG', 'development')
+    return configs[name]
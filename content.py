@@ -0,0 +1,53 @@
+import re
+
+from markupsafe import Markup
+
+# What CKEditor's default toolbar can produce
+ALLOWED_TAGS = {'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'del', 'em', 'figcaption', 'figure',
+                'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's',
+                'span', 'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead',
+                'tr', 'u', 'ul'}
+ALLOWED_ATTRIBUTES = {'a': ['href', 'title', 'target', 'rel'],
+                      'abbr': ['title'],
+                      'img': ['src', 'alt', 'title', 'width', 'height'],
+                      'td': ['colspan', 'rowspan'],
+                      'th': ['colspan', 'rowspan', 'scope']}
+ALLOWED_PROTOCOLS = {'http', 'https', 'mailto'}
+
+EXCERPT_LENGTH = 300
+
+# bleach strips disallowed tags but keeps their text; these lose their text too
+DROP_WITH_CONTENT = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+
+
+def sanitize(html):
+    """Drop scripts, event handlers and anything else outside the allow lists."""
+    # bleach (and html5lib under it) is only needed on writes
+    import bleach
+
+    html = DROP_WITH_CONTENT.sub('', html or '')
+    return bleach.clean(html,
+                        tags=ALLOWED_TAGS,
+                        attributes=ALLOWED_ATTRIBUTES,
+                        protocols=ALLOWED_PROTOCOLS,
+                        strip=True,
+                        strip_comments=True).strip()
+
+
+def plain_text(html):
+    # Keep block boundaries as spaces so words don't run together
+    html = re.sub(r'</(p|div|li|h[1-6]|blockquote|pre|td|th|tr)>|<br\s*/?>', ' ', html)
+    return Markup(html).striptags()
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(' ', 1)[0] + '...'
+
+
+def prepare_content(html):
+    """Return (clean html, plain text, excerpt) for a post body."""
+    clean = sanitize(html)
+    text = plain_text(clean)
+    return clean, text, make_excerpt(text)
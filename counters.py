@@ -0,0 +1,75 @@
+import logging
+import threading
+import weakref
+from collections import Counter
+
+import hooks
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindCounter:
+    """Count hits in memory and write them out in batches.
+
+    incr() only touches a dict. A background thread calls
+    flush(counts) with the increments gathered so far, as
+    {key: increment}, every `interval` seconds or as soon as
+    `max_pending` hits are waiting, and once more at interpreter exit.
+    If flush raises, its increments are kept for the next attempt.
+    """
+
+    def __init__(self, flush, interval=10, max_pending=1000):
+        self._flush = flush
+        self.interval = interval
+        self.max_pending = max_pending
+        self._reset()
+        hooks.at_exit(self, WriteBehindCounter.flush)
+        # A forked worker starts with an empty buffer and no thread
+        hooks.after_fork(self, WriteBehindCounter._reset)
+
+    def _reset(self):
+        self._pending = Counter()
+        self._count = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def incr(self, key, n=1):
+        with self._lock:
+            self._pending[key] += n
+            self._count += n
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(weakref.ref(self),),
+                                                name='write-behind-counter', daemon=True)
+                self._thread.start()
+            if self._count >= self.max_pending:
+                self._wakeup.set()
+
+    def pending(self, key):
+        with self._lock:
+            return self._pending.get(key, 0)
+
+    def flush(self):
+        with self._lock:
+            counts, self._pending, self._count = self._pending, Counter(), 0
+        if not counts:
+            return
+        try:
+            self._flush(dict(counts))
+        except Exception:
+            logger.exception('Could not write %d counters, keeping them', len(counts))
+            with self._lock:
+                self._pending.update(counts)
+                self._count += sum(counts.values())
+
+    @staticmethod
+    def _run(ref):
+        # Only a weak reference between flushes, so the thread ends with its counter
+        while (counter := ref()) is not None:
+            wakeup, interval = counter._wakeup, counter.interval
+            del counter
+            wakeup.wait(interval)
+            wakeup.clear()
+            if (counter := ref()) is not None:
+                counter.flush()
+                del counter
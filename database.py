@@ -0,0 +1,58 @@
+import re
+
+from sqlalchemy import event, text
+
+# Applied to every new SQLite connection. journal_mode=WAL lets readers run
+# while a writer commits; synchronous=NORMAL is durable in WAL mode except on
+# power loss; busy_timeout makes writers wait for the lock instead of failing.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+
+def engine_options(uri, pool_size=10, max_overflow=10, pool_timeout=30):
+    """SQLALCHEMY_ENGINE_OPTIONS for uri, with a sized connection pool."""
+    if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+        # In-memory databases live in a single connection, there is no pool to size
+        return {}
+    return {'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_timeout': pool_timeout,
+            'pool_recycle': 3600}
+
+
+def apply_sqlite_pragmas(engine, pragmas=None):
+    """Run the SQLite PRAGMAs on every connection the engine opens."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def explain_query_plan(session, statement):
+    """SQLite's EXPLAIN QUERY PLAN details for a select() or Query."""
+    statement = getattr(statement, 'statement', statement)
+    bind = session.get_bind()
+    sql = statement.compile(dialect=bind.dialect, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in session.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+
+def full_scans(plan):
+    """Steps of plan that read a whole table rather than an index."""
+    # 'SCAN posts' reads every row; 'SCAN posts USING INDEX ...' walks an
+    # index in order and 'SCAN posts_fts VIRTUAL TABLE ...' is FTS5's own,
+    # unless the rows then go through a sort, which reads them all first
+    scans = [step for step in plan if re.match(r'SCAN \S+$', step)]
+    if 'USE TEMP B-TREE FOR ORDER BY' in plan:
+        scans += [step for step in plan if re.match(r'SCAN \S+ USING ', step)]
+    return scans
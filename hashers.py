@@ -0,0 +1,62 @@
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import hooks
+
+# Method templates understood by werkzeug, filled in with the cost setting
+METHODS = {
+    'pbkdf2:sha256': 'pbkdf2:sha256:{cost}',
+    'pbkdf2:sha512': 'pbkdf2:sha512:{cost}',
+    'scrypt': 'scrypt:{cost}:8:1',
+}
+
+
+def check_legacy_hash(pwhash, password):
+    """Verify the salted HMAC hashes written by old werkzeug ('sha256$salt$hex')."""
+    method, salt, hashval = pwhash.split('$', 2)
+    digest = hmac.new(salt.encode(), password.encode(), method).hexdigest()
+    return hmac.compare_digest(digest, hashval)
+
+
+class PasswordHasher:
+    """Hash and verify passwords with a configurable method and cost.
+
+    Verification runs in a bounded thread pool: hashlib releases the GIL
+    while hashing, so at most `workers` hashes burn CPU at once and the
+    remaining worker threads keep serving other requests.
+    """
+
+    def __init__(self, method='pbkdf2:sha256', cost=600000, workers=None):
+        if method not in METHODS:
+            raise ValueError(f'Unknown password hash method {method!r}')
+        self.method = METHODS[method].format(cost=cost)
+        self.workers = workers or os.cpu_count()
+        self._start_pool()
+        # Pool threads don't survive fork(), give each child its own
+        hooks.after_fork(self, PasswordHasher._start_pool)
+
+    def _start_pool(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                        thread_name_prefix='password-hasher')
+
+    def hash(self, password):
+        return self._pool.submit(generate_password_hash, password, self.method).result()
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._pool.submit(self._verify, pwhash, password).result()
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method
+
+    @staticmethod
+    def _verify(pwhash, password):
+        method = pwhash.split('$', 1)[0]
+        if method in hashlib.algorithms_available:
+            return check_legacy_hash(pwhash, password)
+        return check_password_hash(pwhash, password)
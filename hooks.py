@@ -0,0 +1,39 @@
+"""Fork and exit hooks that don't keep their objects alive.
+
+os.register_at_fork() and atexit.register() hold on to what they're
+given for the life of the process, so a hook per app or per service
+would keep every one ever made. Each of these is registered once per
+process instead, and calls func(obj) for the objects still alive.
+"""
+import atexit
+import os
+import weakref
+
+_after_fork = []
+_at_exit = []
+
+
+def after_fork(obj, func):
+    """Call func(obj) in a forked child, for as long as obj is alive."""
+    _add(_after_fork, obj, func)
+
+
+def at_exit(obj, func):
+    """Call func(obj) at interpreter exit, if obj is still alive."""
+    _add(_at_exit, obj, func)
+
+
+def _add(hooks, obj, func):
+    hooks[:] = [(ref, f) for ref, f in hooks if ref() is not None]
+    hooks.append((weakref.ref(obj), func))
+
+
+def _run(hooks):
+    for ref, func in list(hooks):
+        obj = ref()
+        if obj is not None:
+            func(obj)
+
+
+os.register_at_fork(after_in_child=lambda: _run(_after_fork))
+atexit.register(_run, _at_exit)
@@ -0,0 +1,74 @@
+import os
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Widths of the generated profile picture variants, in pixels
+THUMBNAIL_SIZES = (150, 300)
+
+
+def variant_name(pic_name, size):
+    stem = os.path.splitext(pic_name)[0]
+    return f'{stem}_{size}.webp'
+
+
+def make_thumbnails(folder, pic_name, sizes=THUMBNAIL_SIZES, quality=80):
+    """Decode pic_name once and write a square WebP variant per size.
+
+    The variants are re-encoded from pixels only, so EXIF/GPS and other
+    metadata of the upload is dropped. Returns {size: variant file name}.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(os.path.join(folder, pic_name)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        variants = {}
+        for size in sorted(sizes, reverse=True):
+            thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            name = variant_name(pic_name, size)
+            thumb.save(os.path.join(folder, name), 'WEBP', quality=quality, method=4)
+            variants[size] = name
+    return variants
+
+
+class ImagePipeline:
+    """Generate profile picture thumbnails on a background thread.
+
+    on_done(user_id, pic_name, variants) is called from the worker thread
+    once the variants of an upload are on disk.
+    """
+
+    def __init__(self, folder, on_done, sizes=THUMBNAIL_SIZES):
+        self.folder = folder
+        self.on_done = on_done
+        self.sizes = sizes
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, pic_name):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run,
+                                                name='image-pipeline',
+                                                daemon=True)
+                self._thread.start()
+        self._queue.put((user_id, pic_name))
+
+    def join(self):
+        """Block until every queued upload has been processed."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            user_id, pic_name = self._queue.get()
+            try:
+                variants = make_thumbnails(self.folder, pic_name, self.sizes)
+                self.on_done(user_id, pic_name, variants)
+            except Exception:
+                logger.exception('Could not process profile picture %s', pic_name)
+            finally:
+                self._queue.task_done()
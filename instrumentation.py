@@ -0,0 +1,227 @@
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from functools import partial
+
+from flask import Response, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+# Upper bounds, in seconds, of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels):
+    return ','.join(f'{key}="{value}"' for key, value in labels.items())
+
+
+class EndpointStats:
+    """Running totals for the requests of one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.wall_time = 0.0
+        self.template_time = 0.0
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.profile = None
+
+    def add(self, wall_time, template_time, sql_count, sql_time):
+        self.requests += 1
+        self.wall_time += wall_time
+        self.template_time += template_time
+        self.sql_count += sql_count
+        self.sql_time += sql_time
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if wall_time <= bound:
+                self.buckets[i] += 1
+
+    def average(self, total):
+        return total / self.requests if self.requests else 0.0
+
+
+class Instrumentation:
+    """Opt-in per endpoint timings, SQL counts and sampled cProfile output.
+
+    Enabled by INSTRUMENTATION_ENABLED. Every request records its wall
+    time, the time spent in render_template() and the count and time of
+    the SQL statements it ran; PROFILE_SAMPLE_RATE of them also run under
+    cProfile, one at a time. Totals are served in the Prometheus text
+    format at /metrics.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.endpoints = {}
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        app.extensions['instrumentation'] = self
+        self.enabled = app.config['INSTRUMENTATION_ENABLED']
+        if not self.enabled:
+            return
+        self.sample_rate = app.config['PROFILE_SAMPLE_RATE']
+        self.app = app
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_streaming)
+        app.teardown_request(self.finish_request)
+        before_render_template.connect(self.start_template, app)
+        template_rendered.connect(self.finish_template, app)
+        event.listen(engine, 'before_cursor_execute', self.start_query)
+        event.listen(engine, 'after_cursor_execute', self.finish_query)
+        event.listen(engine, 'handle_error', self.failed_query)
+        app.add_url_rule('/metrics', 'metrics', self.metrics)
+
+    def start_request(self):
+        g.request_metrics = {'start': time.perf_counter(),
+                             'template_time': 0.0,
+                             'template_depth': 0,
+                             'template_start': 0.0,
+                             'sql_count': 0,
+                             'sql_time': 0.0,
+                             'profile': None}
+        # cProfile can only run one profiler per process at a time
+        if random.random() < self.sample_rate and self._profile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                self._profile_lock.release()
+            else:
+                g.request_metrics['profile'] = profile
+
+    def finish_streaming(self, response):
+        """Record streamed responses once the last chunk is sent rather than at teardown."""
+        metrics = g.get('request_metrics')
+        if metrics is not None and response.is_streamed:
+            metrics['streamed'] = True
+            # Not a generator's finally: a HEAD, 204 or 304 response body is
+            # closed without ever being iterated, and that would never run
+            response.call_on_close(partial(self._record, metrics, request.endpoint))
+        return response
+
+    def finish_request(self, exc):
+        metrics = g.get('request_metrics')
+        if metrics is None or metrics.get('streamed'):
+            return
+        del g.request_metrics
+        self._record(metrics, request.endpoint)
+
+    def _record(self, metrics, endpoint):
+        wall_time = time.perf_counter() - metrics['start']
+        profile = metrics['profile']
+        if profile is not None:
+            profile.disable()
+            self._profile_lock.release()
+        endpoint = endpoint or '<unmatched>'
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.add(wall_time, metrics['template_time'], metrics['sql_count'], metrics['sql_time'])
+            if profile is not None:
+                if stats.profile is None:
+                    stats.profile = pstats.Stats(profile)
+                else:
+                    stats.profile.add(profile)
+
+    def start_template(self, app, template, context, **extra):
+        metrics = g.get('request_metrics')
+        if metrics is not None:
+            # Only the outermost render is timed, it includes the nested ones
+            if metrics['template_depth'] == 0:
+                metrics['template_start'] = time.perf_counter()
+            metrics['template_depth'] += 1
+
+    def finish_template(self, app, template, context, **extra):
+        metrics = g.get('request_metrics')
+        if metrics is not None and metrics['template_depth']:
+            metrics['template_depth'] -= 1
+            if metrics['template_depth'] == 0:
+                metrics['template_time'] += time.perf_counter() - metrics['template_start']
+
+    def start_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def finish_query(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if has_request_context():
+            metrics = g.get('request_metrics')
+            if metrics is not None:
+                metrics['sql_count'] += 1
+                metrics['sql_time'] += elapsed
+
+    def failed_query(self, context):
+        if context.connection is not None and context.connection.info.get('query_start'):
+            context.connection.info['query_start'].pop()
+
+    def snapshot(self):
+        """{endpoint: EndpointStats} copy that is safe to read while requests run."""
+        with self._lock:
+            snapshot = {}
+            for endpoint, stats in self.endpoints.items():
+                copy = EndpointStats()
+                copy.__dict__.update(stats.__dict__, buckets=list(stats.buckets))
+                snapshot[endpoint] = copy
+            return snapshot
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def profile_report(self, endpoint, limit=30):
+        """Top functions by cumulative time in the sampled profiles of endpoint."""
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None or stats.profile is None:
+                return None
+            out = io.StringIO()
+            stats.profile.stream = out
+            stats.profile.sort_stats('cumulative').print_stats(limit)
+            return out.getvalue()
+
+    def metrics(self):
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{name}{suffix}{{{format_labels(labels)}}} {value}')
+
+        endpoints = sorted(self.snapshot().items())
+        durations = []
+        for endpoint, stats in endpoints:
+            for bound, count in zip(DURATION_BUCKETS + ('+Inf',), stats.buckets + [stats.requests]):
+                durations.append(('_bucket', {'endpoint': endpoint, 'le': bound}, count))
+            durations.append(('_sum', {'endpoint': endpoint}, stats.wall_time))
+            durations.append(('_count', {'endpoint': endpoint}, stats.requests))
+        metric('flasker_request_duration_seconds', 'histogram', 'Request wall time', durations)
+        metric('flasker_template_seconds_total', 'counter', 'Time spent rendering templates',
+               [('', {'endpoint': endpoint}, stats.template_time) for endpoint, stats in endpoints])
+        metric('flasker_sql_queries_total', 'counter', 'SQL statements executed',
+               [('', {'endpoint': endpoint}, stats.sql_count) for endpoint, stats in endpoints])
+        metric('flasker_sql_seconds_total', 'counter', 'Time spent executing SQL statements',
+               [('', {'endpoint': endpoint}, stats.sql_time) for endpoint, stats in endpoints])
+
+        caches = sorted((name, extension.stats()) for name, extension in self.app.extensions.items()
+                        if name.endswith('_cache'))
+        metric('flasker_cache_hits_total', 'counter', 'Cache hits',
+               [('', {'cache': name}, stats['hits']) for name, stats in caches])
+        metric('flasker_cache_misses_total', 'counter', 'Cache misses',
+               [('', {'cache': name}, stats['misses']) for name, stats in caches])
+
+        limiter = self.app.extensions.get('rate_limiter')
+        if limiter is not None:
+            limits = sorted(limiter.stats().items())
+            metric('flasker_rate_limit_requests_total', 'counter', 'Requests checked against a rate limit',
+                   [('', {'limit': name, 'result': result}, stats[result])
+                    for name, stats in limits for result in ('allowed', 'rejected')])
+            metric('flasker_rate_limit_keys', 'gauge', 'Clients and usernames with a token bucket',
+                   [('', {}, len(limiter.store))])
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
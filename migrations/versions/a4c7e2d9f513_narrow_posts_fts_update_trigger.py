@@ -0,0 +1,37 @@
+"""reindex posts for search only when title or content_text change
+
+Revision ID: a4c7e2d9f513
+Revises: 8e4f1a2b6c95
+Create Date: 2026-10-18 21:12:47.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2d9f513'
+down_revision = '8e4f1a2b6c95'
+branch_labels = None
+depends_on = None
+
+
+def create_update_trigger(columns):
+    op.execute(f"CREATE TRIGGER posts_fts_au AFTER UPDATE {columns}ON posts BEGIN "
+               "INSERT INTO posts_fts(posts_fts, rowid, title, content_text) "
+               "VALUES ('delete', old.id, old.title, old.content_text); "
+               "INSERT INTO posts_fts(rowid, title, content_text) "
+               "VALUES (new.id, new.title, new.content_text); "
+               "END")
+
+
+def upgrade():
+    # Flushing view counts updates posts.views alone; that must not delete
+    # and re-add the post in the index while holding the write lock
+    op.execute("DROP TRIGGER posts_fts_au")
+    create_update_trigger('OF title, content_text ')
+
+
+def downgrade():
+    op.execute("DROP TRIGGER posts_fts_au")
+    create_update_trigger('')
@@ -0,0 +1,44 @@
+"""add posts full-text search index
+
+Revision ID: d7a3e5c1f820
+Revises: b41f0c2d7e13
+Create Date: 2026-10-18 11:40:05.732190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3e5c1f820'
+down_revision = 'b41f0c2d7e13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # External content FTS5 table: the text lives in posts, the index in posts_fts
+    op.execute("CREATE VIRTUAL TABLE posts_fts USING fts5("
+               "title, content, content='posts', content_rowid='id')")
+    op.execute("CREATE TRIGGER posts_fts_ai AFTER INSERT ON posts BEGIN "
+               "INSERT INTO posts_fts(rowid, title, content) "
+               "VALUES (new.id, new.title, new.content); "
+               "END")
+    op.execute("CREATE TRIGGER posts_fts_ad AFTER DELETE ON posts BEGIN "
+               "INSERT INTO posts_fts(posts_fts, rowid, title, content) "
+               "VALUES ('delete', old.id, old.title, old.content); "
+               "END")
+    op.execute("CREATE TRIGGER posts_fts_au AFTER UPDATE ON posts BEGIN "
+               "INSERT INTO posts_fts(posts_fts, rowid, title, content) "
+               "VALUES ('delete', old.id, old.title, old.content); "
+               "INSERT INTO posts_fts(rowid, title, content) "
+               "VALUES (new.id, new.title, new.content); "
+               "END")
+    op.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER posts_fts_au")
+    op.execute("DROP TRIGGER posts_fts_ad")
+    op.execute("DROP TRIGGER posts_fts_ai")
+    op.execute("DROP TABLE posts_fts")
@@ -0,0 +1,262 @@
+from datetime import datetime
+
+from flask import current_app
+from flask_login import UserMixin
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, MetaData, event, tuple_
+from sqlalchemy.orm import joinedload, with_parent
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from content import prepare_content
+
+convention = {
+    "ix": 'ix_%(column_0_label)s',
+    "uq": "uq_%(table_name)s_%(column_0_name)s",
+    "ck": "ck_%(table_name)s_%(constraint_name)s",
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+    "pk": "pk_%(table_name)s"
+}
+
+metadata = MetaData(naming_convention=convention)
+db = SQLAlchemy(metadata=metadata)
+
+
+def encode_cursor(post):
+    return f'{post.date_posted.isoformat()}_{post.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        date_posted, id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date_posted), int(id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def posts_page_query(query, after=None, before=None, per_page=None):
+    """The query paginate_posts() runs: per_page + 1 posts after or before a cursor.
+
+    Posts before a cursor come oldest first.
+    """
+    per_page = per_page or current_app.config['POSTS_PER_PAGE']
+    key = tuple_(Posts.date_posted, Posts.id)
+    if before:
+        return query.filter(key > before) \
+            .order_by(Posts.date_posted.asc(), Posts.id.asc()) \
+            .limit(per_page + 1)
+    if after:
+        query = query.filter(key < after)
+    return query.order_by(Posts.date_posted.desc(), Posts.id.desc()) \
+        .limit(per_page + 1)
+
+
+def paginate_posts(query, after=None, before=None, per_page=None):
+    """Keyset pagination over (date_posted, id), newest first.
+
+    Returns (posts, next_cursor, prev_cursor). Every page is a single
+    index range scan, so page N costs the same as page 1.
+    """
+    per_page = per_page or current_app.config['POSTS_PER_PAGE']
+    after = decode_cursor(after) if after else None
+    before = decode_cursor(before) if before else None
+    posts = posts_page_query(query, after, before, per_page).all()
+
+    if before:
+        has_more = len(posts) > per_page
+        posts = posts[:per_page][::-1]
+        has_next, has_prev = True, has_more
+    else:
+        has_next = len(posts) > per_page
+        posts = posts[:per_page]
+        has_prev = after is not None
+
+    next_cursor = encode_cursor(posts[-1]) if posts and has_next else None
+    prev_cursor = encode_cursor(posts[0]) if posts and has_prev else None
+    return posts, next_cursor, prev_cursor
+
+
+class PostsPage:
+    """paginate_posts() for streamed pages: one page of posts, read as it is iterated.
+
+    Rows come from the cursor in batches of batch_size, so memory stays
+    flat however large per_page is. next_cursor and prev_cursor are only
+    known once the page has been iterated; templates read them after the
+    loop.
+    """
+
+    def __init__(self, query, after=None, before=None, per_page=None, batch_size=100):
+        self.query = query
+        self.after = decode_cursor(after) if after else None
+        self.before = decode_cursor(before) if before else None
+        self.per_page = per_page or current_app.config['POSTS_PER_PAGE']
+        self.batch_size = batch_size
+        self.next_cursor = None
+        self.prev_cursor = None
+
+    def bound_query(self):
+        """(date_posted, id) of the newest post of a page before a cursor, then of the next newer one."""
+        # Found first so the page is read newest first like any other,
+        # instead of reversed in memory
+        return self.query.enable_eagerloads(False) \
+            .with_entities(Posts.date_posted, Posts.id) \
+            .filter(tuple_(Posts.date_posted, Posts.id) > self.before) \
+            .order_by(Posts.date_posted.asc(), Posts.id.asc()) \
+            .offset(self.per_page - 1).limit(2)
+
+    def page_query(self, bound=None):
+        """The page's posts newest first, down to bound if it's a page before a cursor."""
+        key = tuple_(Posts.date_posted, Posts.id)
+        query = self.query
+        if self.before:
+            query = query.filter(key > self.before)
+            if bound:
+                query = query.filter(key <= tuple(bound))
+        elif self.after:
+            query = query.filter(key < self.after)
+        return query.order_by(Posts.date_posted.desc(), Posts.id.desc()) \
+            .limit(self.per_page + 1).yield_per(self.batch_size)
+
+    def __iter__(self):
+        if self.before:
+            bounds = self.bound_query().all()
+            query = self.page_query(bounds[0] if bounds else None)
+            has_prev = len(bounds) > 1
+        else:
+            query = self.page_query()
+            has_prev = self.after is not None
+
+        count = 0
+        last = None
+        for post in query:
+            count += 1
+            if count > self.per_page:
+                break
+            if count == 1 and has_prev:
+                self.prev_cursor = encode_cursor(post)
+            last = post
+            yield post
+        if last is not None and (count > self.per_page or self.before):
+            self.next_cursor = encode_cursor(last)
+
+
+class Users(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(128), nullable=False, unique=True)
+    name = db.Column(db.String(200), nullable=False)
+    password_hash = db.Column(db.String(256))
+    email = db.Column(db.String(200), nullable=False, unique=True)
+    favorite_color = db.Column(db.String(120), default='Red')
+    # about_author = db.Column(db.String(500), nullable=True)
+    about_author = db.Column(db.Text(500), nullable=True)
+    created = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    profile_pic = db.Column(db.String(), nullable=True)
+    profile_pic_small = db.Column(db.String(), nullable=True)
+    profile_pic_large = db.Column(db.String(), nullable=True)
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Kept up to date by the POST_COUNT_TRIGGERS on posts
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_posted_at = db.Column(db.DateTime, nullable=True)
+    posts = db.relationship('Posts', backref='poster')
+
+
+class Posts(db.Model):
+    __table_args__ = (
+        # An author's posts newest first; also serves plain poster_id lookups
+        db.Index('ix_posts_poster_id_date_posted', 'poster_id', 'date_posted'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255))
+    content = db.Column(db.Text)
+    content_text = db.Column(db.Text)
+    excerpt = db.Column(db.Text)
+    # author = db.Column(db.String(255))
+    date_posted = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    slug = db.Column(db.String(255), unique=True, index=True)
+    poster_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Written in batches by the view counter, see flush_post_views()
+    views = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+
+    def set_content(self, html):
+        """Sanitize editor HTML once, on write, and store its text renditions."""
+        self.content, self.content_text, self.excerpt = prepare_content(html)
+
+    @property
+    def password(self):
+        raise AttributeError('password is not a readable attribute!')
+
+    @password.setter
+    def password(self, password):
+        self.password_hash = generate_password_hash(password)
+
+    def verify_password(self, password):
+        return check_password_hash(self.password_hash, password)
+
+    def __str__(self):
+        return f'{self.name}'
+
+
+# The queries the views run on every request, shared with
+# tests/test_query_plans.py which checks none of them reads a whole table
+
+def user_by_username(username):
+    return Users.query.filter_by(username=username)
+
+
+def user_by_email(email):
+    return Users.query.filter_by(email=email)
+
+
+def users_by_created():
+    return Users.query.order_by(Users.created)
+
+
+def posts_with_posters():
+    """Posts with their author loaded in the same query."""
+    return Posts.query.options(joinedload(Posts.poster))
+
+
+def most_viewed_posts(limit):
+    # Walks ix_posts_views from the top, views are flushed every few seconds
+    return posts_with_posters().order_by(Posts.views.desc()).limit(limit)
+
+
+def author_posts(author):
+    # poster is the author already in the session, so no join is needed
+    return Posts.query.filter(with_parent(author, Users.posts))
+
+
+# Maintain users.post_count and users.last_posted_at in the database, so
+# bulk inserts and deletes that bypass the ORM keep them right too
+POST_COUNT_TRIGGERS = (
+    "CREATE TRIGGER posts_count_ai AFTER INSERT ON posts BEGIN "
+    "UPDATE users SET post_count = post_count + 1, "
+    "last_posted_at = max(coalesce(last_posted_at, new.date_posted), new.date_posted) "
+    "WHERE id = new.poster_id; "
+    "END",
+    "CREATE TRIGGER posts_count_ad AFTER DELETE ON posts BEGIN "
+    "UPDATE users SET post_count = post_count - 1, "
+    "last_posted_at = (SELECT max(date_posted) FROM posts WHERE poster_id = old.poster_id) "
+    "WHERE id = old.poster_id; "
+    "END",
+    "CREATE TRIGGER posts_count_au AFTER UPDATE OF poster_id ON posts "
+    "WHEN old.poster_id IS NOT new.poster_id BEGIN "
+    "UPDATE users SET post_count = post_count - 1, "
+    "last_posted_at = (SELECT max(date_posted) FROM posts WHERE poster_id = old.poster_id) "
+    "WHERE id = old.poster_id; "
+    "UPDATE users SET post_count = post_count + 1, "
+    "last_posted_at = max(coalesce(last_posted_at, new.date_posted), new.date_posted) "
+    "WHERE id = new.poster_id; "
+    "END",
+)
+for trigger in POST_COUNT_TRIGGERS:
+    event.listen(Posts.__table__, 'after_create', DDL(trigger).execute_if(dialect='sqlite'))
+
+
+@event.listens_for(Users, 'before_update')
+@event.listens_for(Posts, 'before_update')
+def bump_revision(mapper, connection, target):
+    # Computed in SQL so a stale copy from user_cache can't lose a bump
+    if db.session.is_modified(target, include_collections=False):
+        target.revision = type(target).revision + 1
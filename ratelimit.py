@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import hooks
+
+BUCKETS_SCHEMA = ('CREATE TABLE IF NOT EXISTS buckets ('
+                  'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL'
+                  ') WITHOUT ROWID')
+# Takes a token if the bucket has one after refilling, creating it full
+# (less the token) if it's new; returns no row if the bucket is empty.
+# The SET expressions all read the row's values from before the update
+TAKE_TOKEN = ('INSERT INTO buckets (key, tokens, updated, full_at) '
+              'VALUES (:key, :capacity - 1, :now, :now + 1.0 / :rate) '
+              'ON CONFLICT (key) DO UPDATE SET '
+              'tokens = min(:capacity, tokens + (:now - updated) * :rate) - 1, '
+              'updated = :now, '
+              'full_at = :now + (:capacity + 1 - min(:capacity, tokens + (:now - updated) * :rate)) / :rate '
+              'WHERE min(:capacity, tokens + (:now - updated) * :rate) >= 1 '
+              'RETURNING tokens')
+
+
+class MemoryBuckets:
+    """Token buckets for one process, least recently used first.
+
+    A bucket that has refilled is the same as no bucket, so those are
+    dropped as they come to the front; past max_keys the least recently
+    used bucket goes whether it has refilled or not.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        """Take a token from key's bucket; seconds until one is free if there's none, else 0."""
+        now = time.monotonic()
+        with self._lock:
+            while self._buckets and next(iter(self._buckets.values()))[2] <= now:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets.pop(key, None)
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            # (tokens, updated, full again at)
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBuckets:
+    """Token buckets in a SQLite file, shared by every process on the host.
+
+    Each take() is a single upsert. Refilled buckets are deleted every
+    purge_interval seconds. Connections are per thread and opened on
+    first use, so a forked worker never shares its parent's.
+    """
+
+    def __init__(self, path, purge_interval=60):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._reset()
+        hooks.after_fork(self, SQLiteBuckets._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._purged = time.time()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Losing a few buckets in a power cut is fine
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(BUCKETS_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate):
+        """Take a token from key's bucket; seconds until one is free if there's none, else 0."""
+        conn = self._connection()
+        now = time.time()
+        if now - self._purged > self.purge_interval:
+            self._purged = now
+            conn.execute('DELETE FROM buckets WHERE full_at <= ?', (now,))
+        params = {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}
+        if conn.execute(TAKE_TOKEN, params).fetchone() is not None:
+            return 0.0
+        row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+        tokens = 0.0 if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+        # Another process may have refilled it since, still turn this one away
+        return max((1 - tokens) / rate, 0.001)
+
+    def __len__(self):
+        return self._connection().execute('SELECT count(*) FROM buckets').fetchone()[0]
+
+
+class RateLimiter:
+    """Named token bucket limits over a MemoryBuckets or SQLiteBuckets store.
+
+    limits maps a name to (requests, seconds): each key may make
+    `requests` requests at once and gets them back at that rate.
+    """
+
+    def __init__(self, store, limits, enabled=True):
+        self.store = store
+        self.limits = limits
+        self.enabled = enabled
+        self.allowed = Counter()
+        self.rejected = Counter()
+        self._lock = threading.Lock()
+
+    def hit(self, name, key):
+        """Count a request by key against limit name; seconds to wait if it's over, else 0."""
+        if not self.enabled:
+            return 0.0
+        requests, seconds = self.limits[name]
+        wait = self.store.take(f'{name}:{key}', requests, requests / seconds)
+        with self._lock:
+            (self.rejected if wait else self.allowed)[name] += 1
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {name: {'allowed': self.allowed[name], 'rejected': self.rejected[name]}
+                    for name in self.limits}
@@ -0,0 +1,115 @@
+from functools import cached_property
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+# Snippet markers, swapped for <mark> tags after the HTML is stripped
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+
+def fts_query(term):
+    """Quote every word so user input can't break the FTS5 query syntax."""
+    words = term.split()
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in words)
+
+
+def highlight(snippet):
+    """Escape a plain-text snippet and turn the match markers into <mark>."""
+    plain = escape(snippet or '')
+    return Markup(plain.replace(MARK_START, Markup('<mark>'))
+                  .replace(MARK_END, Markup('</mark>')))
+
+
+def search_statements(match, page=1, per_page=10):
+    """(count, hits) statements for an FTS5 query made by fts_query()."""
+    count = text('SELECT count(*) FROM posts_fts WHERE posts_fts MATCH :match') \
+        .bindparams(match=match)
+    hits = text('SELECT rowid, '
+                'snippet(posts_fts, 1, :start, :end, \'...\', 32) '
+                'FROM posts_fts WHERE posts_fts MATCH :match '
+                'ORDER BY bm25(posts_fts, 10.0, 1.0) '
+                'LIMIT :limit OFFSET :offset') \
+        .bindparams(match=match,
+                    start=MARK_START,
+                    end=MARK_END,
+                    limit=per_page,
+                    offset=(page - 1) * per_page)
+    return count, hits
+
+
+def search_posts(session, term, page=1, per_page=10):
+    """Return (hits, total) for a full-text search over posts.
+
+    hits is a list of (post_id, snippet) ordered by BM25 rank, best first.
+    """
+    match = fts_query(term)
+    if not match:
+        return [], 0
+
+    count, hits = search_statements(match, page, per_page)
+    total = session.execute(count).scalar()
+    hits = [(post_id, highlight(snippet)) for post_id, snippet in session.execute(hits)]
+    return hits, total
+
+
+class SearchPage:
+    """search_posts() for streamed pages: nothing runs until total or hits is read."""
+
+    def __init__(self, session, term, page=1, per_page=10):
+        self.session = session
+        self.term = term
+        self.page = page
+        self.per_page = per_page
+
+    @cached_property
+    def _result(self):
+        return search_posts(self.session, self.term, self.page, self.per_page)
+
+    @property
+    def hits(self):
+        return self._result[0]
+
+    @property
+    def total(self):
+        return self._result[1]
+
+    @property
+    def has_next(self):
+        return self.page * self.per_page < self.total
+
+
+# The posts_fts table and the triggers that keep it in sync with posts, as
+# left by the migrations. For databases built with db.create_all()
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+    "title, content_text, content='posts', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, title, content_text) "
+    "VALUES (new.id, new.title, new.content_text); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content_text) "
+    "VALUES ('delete', old.id, old.title, old.content_text); "
+    "END",
+    # Only the indexed columns: view count flushes update posts.views alone
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content_text ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, content_text) "
+    "VALUES ('delete', old.id, old.title, old.content_text); "
+    "INSERT INTO posts_fts(rowid, title, content_text) "
+    "VALUES (new.id, new.title, new.content_text); "
+    "END",
+)
+
+
+def create_index(session):
+    """Create the full-text index on a database made by db.create_all()."""
+    for statement in FTS_SCHEMA:
+        session.execute(text(statement))
+    session.commit()
+
+
+def rebuild_index(session):
+    """Re-read every row of posts into the FTS index."""
+    session.execute(text("INSERT INTO posts_fts(posts_fts) VALUES('rebuild')"))
+    session.commit()
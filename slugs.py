@@ -0,0 +1,99 @@
+import re
+import threading
+import unicodedata
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Posts
+
+MAX_SLUG_LENGTH = 200
+NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def slugify(text):
+    """'Héllo, World!' -> 'hello-world'."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    slug = NON_WORD.sub('-', text.lower()).strip('-')
+    return slug[:MAX_SLUG_LENGTH].rstrip('-') or 'post'
+
+
+def unique_slug(text, exclude_id=None):
+    """slugify(text), suffixed with -2, -3, ... if another post already has it."""
+    base = slugify(text)
+    query = db.session.query(Posts.slug).filter((Posts.slug == base) | Posts.slug.like(f'{base}-%'))
+    if exclude_id is not None:
+        query = query.filter(Posts.id != exclude_id)
+    with db.session.no_autoflush:
+        taken = {slug for slug, in query}
+    if base not in taken:
+        return base
+    n = 2
+    while f'{base}-{n}' in taken:
+        n += 1
+    return f'{base}-{n}'
+
+
+def save_post(post, slug_text, attempts=3):
+    """Commit post with a free slug made from slug_text.
+
+    Two requests can pick the same free slug at once; the unique index
+    turns the loser's commit into an IntegrityError and it picks again.
+    """
+    # The rollback discards the unsaved edits, keep them to re-apply
+    changes = {attr.key: attr.value for attr in inspect(post).attrs if attr.history.has_changes()}
+    for attempt in range(attempts):
+        for key, value in changes.items():
+            setattr(post, key, value)
+        post.slug = unique_slug(slug_text, exclude_id=post.id)
+        db.session.add(post)
+        try:
+            db.session.commit()
+            return
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == attempts - 1:
+                raise
+
+
+class SlugMap:
+    """In-process slug -> post id map for resolving /posts/<slug>.
+
+    Loaded from the database on first use in each process rather than in
+    create_app(), which must not connect (see wsgi.py). Other processes
+    may have changed a slug since, so callers check the post they load
+    and fall back to lookup() on a mismatch.
+    """
+
+    def __init__(self):
+        self._ids = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._ids is None:
+                self._ids = dict(db.session.query(Posts.slug, Posts.id).filter(Posts.slug.isnot(None)))
+        return self._ids
+
+    def get(self, slug):
+        return self._load().get(slug)
+
+    def lookup(self, slug):
+        """Id of the post with slug, read from the unique index, or None."""
+        id = db.session.query(Posts.id).filter_by(slug=slug).scalar()
+        if id is None:
+            self.discard(slug)
+        else:
+            self.set(slug, id)
+        return id
+
+    def set(self, slug, id):
+        if slug:
+            self._load()[slug] = id
+
+    def discard(self, slug):
+        if self._ids is not None:
+            self._ids.pop(slug, None)
+
+    def __len__(self):
+        return len(self._load())
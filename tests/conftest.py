@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert
+
+from app import create_app
+from config import TestingConfig
+from models import db, Users, Posts
+from search import create_index
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """create_app() on a new database in tmp_path, with config overridden by keyword."""
+    apps = []
+
+    def make(**config):
+        class Config(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / f"test{len(apps)}.db"}'
+            # Every request renders, and view counts stay in memory until teardown
+            PAGE_CACHE_SIZE = 0
+            VIEW_COUNTER_FLUSH_INTERVAL = 3600
+
+        for name, value in config.items():
+            setattr(Config, name, value)
+        app = create_app(Config)
+        with app.app_context():
+            db.create_all()
+            create_index(db.session)
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        app.extensions['view_counter'].flush()
+        with app.app_context():
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """SQL statements run on the app's engine while the test runs."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def add_posts(app, count, authors=3, word='flask'):
+    """count posts, spread over `authors` new users, all containing word."""
+    with app.app_context():
+        first = db.session.query(db.func.count(Users.id)).scalar()
+        db.session.execute(insert(Users), [{'username': f'author{first + i}',
+                                            'name': f'Author {first + i}',
+                                            'email': f'author{first + i}@example.com'}
+                                           for i in range(authors)])
+        author_ids = [id for id, in db.session.query(Users.id).order_by(Users.id.desc()).limit(authors)]
+        offset = db.session.query(db.func.count(Posts.id)).scalar()
+        start = datetime(2024, 1, 1)
+        db.session.execute(insert(Posts), [{'title': f'Post {i}',
+                                            'content': f'<p>{word} post {i}</p>',
+                                            'content_text': f'{word} post {i}',
+                                            'excerpt': f'{word} post {i}',
+                                            'slug': f'post-{i}',
+                                            'date_posted': start + timedelta(minutes=i),
+                                            'poster_id': author_ids[i % authors]}
+                                           for i in range(offset, offset + count)])
+        db.session.commit()
+
+
+def add_user(app, username='alice', password='secret'):
+    from app import password_hasher
+
+    with app.app_context():
+        user = Users(username=username, name=username.title(), email=f'{username}@example.com',
+                     password_hash=password_hasher.hash(password))
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def login(client, username='alice', password='secret'):
+    return client.post('/login', data={'username': username, 'password_hash': password})
@@ -0,0 +1,64 @@
+"""Weak ETags on the JSON API: a 304 until a row in the response gets a new revision."""
+import pytest
+
+from conftest import add_posts
+from models import db, Users, Posts
+
+
+def edit(app, find, **changes):
+    with app.app_context():
+        row = find()
+        for name, value in changes.items():
+            setattr(row, name, value)
+        db.session.commit()
+
+
+def revalidate(client, path, etag):
+    return client.get(path, headers={'If-None-Match': etag})
+
+
+@pytest.mark.parametrize('path', ['/api/v1/posts/1', '/api/v1/posts', '/api/v1/users'])
+def test_unchanged_response_is_not_modified(app, client, path):
+    add_posts(app, 3)
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+
+    response = revalidate(client, path, etag)
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.get_data() == b''
+
+
+@pytest.mark.parametrize('path, find, changes', [
+    ('/api/v1/posts/1', lambda: db.session.get(Posts, 1), {'title': 'Edited'}),
+    ('/api/v1/posts/1', lambda: db.session.get(Posts, 1).poster, {'name': 'Renamed author'}),
+    ('/api/v1/posts', lambda: db.session.get(Posts, 2), {'title': 'Edited'}),
+    ('/api/v1/posts', lambda: db.session.get(Posts, 2).poster, {'name': 'Renamed author'}),
+    ('/api/v1/users', lambda: db.session.get(Users, 3), {'about_author': 'Edited'}),
+])
+def test_revision_bump_changes_the_etag(app, client, path, find, changes):
+    add_posts(app, 3)
+    etag = client.get(path).headers['ETag']
+
+    edit(app, find, **changes)
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert revalidate(client, path, response.headers['ETag']).status_code == 304
+
+
+def test_new_post_changes_the_listing_etag(app, client):
+    add_posts(app, 3)
+    etag = client.get('/api/v1/posts').headers['ETag']
+    add_posts(app, 1)
+    assert revalidate(client, '/api/v1/posts', etag).status_code == 200
+
+
+def test_view_counts_do_not_change_the_etag(app, client):
+    add_posts(app, 3)
+    etag = client.get('/api/v1/posts/1').headers['ETag']
+    client.get('/posts/post-0')
+    app.extensions['view_counter'].flush()
+    assert revalidate(client, '/api/v1/posts/1', etag).status_code == 304
@@ -0,0 +1,25 @@
+"""Fingerprinted static files: only files inside static/ are ever read."""
+from flask import url_for
+
+
+def test_path_outside_static_is_not_read(app, client):
+    assets = app.extensions['static_assets']
+    for path in ('/static/%2e%2e/app.abcdefabcdef.py', '/static/../config.abcdefabcdef.py',
+                 '/static/css/%2e%2e/%2e%2e/app.py'):
+        assert client.get(path).status_code == 404
+    assert not [filename for filename in assets.digests if '..' in filename]
+
+
+def test_uploads_are_hashed_on_first_use(app, client):
+    assets = app.extensions['static_assets']
+    assert 'css/style.css' in assets.digests
+    assert 'images/default_profile_pic.png' not in assets.digests
+
+    with app.test_request_context():
+        url = url_for('static', filename='images/default_profile_pic.png')
+    digest = assets.digests['images/default_profile_pic.png']
+    assert url == f'/static/images/default_profile_pic.{digest}.png'
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    response.close()
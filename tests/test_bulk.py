@@ -0,0 +1,52 @@
+import json
+
+from bulk import Checkpoint, Importer
+from conftest import add_posts, add_user
+from models import db, Posts
+
+
+def import_posts(app, records, **kwargs):
+    with app.app_context():
+        return Importer(db.session, 'pbkdf2:sha256:1000', workers=1, **kwargs).run('posts', iter(records))
+
+
+def slugs(app):
+    with app.app_context():
+        return [slug for slug, in db.session.query(Posts.slug).order_by(Posts.id)]
+
+
+def test_imported_slugs_are_normalized_and_unique(app, client):
+    add_posts(app, 1)
+    add_user(app)
+    records = [{'title': title, 'slug': slug, 'author': 'alice'}
+               for title, slug in [('Slash', 'a/b c?'), ('Blank', ''), ('Blank too', ' '),
+                                   ('Taken', 'post-0'), ('Taken again', 'Post 0'), ('None', None)]]
+    assert import_posts(app, records) == (6, 6)
+    assert slugs(app) == ['post-0', 'a-b-c', None, None, 'post-0-2', 'post-0-3', None]
+    assert client.get('/posts/a-b-c').status_code == 200
+
+
+def test_interrupted_import_resumes_without_duplicates(app, tmp_path, monkeypatch):
+    add_user(app)
+    path = tmp_path / 'posts.jsonl'
+    path.write_text(''.join(json.dumps({'title': f'Imported {n}', 'slug': f'imported-{n}', 'author': 'alice'}) + '\n'
+                            for n in range(7)))
+    runner = app.test_cli_runner()
+    save = Checkpoint.save
+
+    def save_then_crash(self, records):
+        save(self, records)
+        raise RuntimeError('killed')
+
+    monkeypatch.setattr(Checkpoint, 'save', save_then_crash)
+    result = runner.invoke(args=['import', 'posts', str(path), '--batch-size', '3', '--workers', '1'])
+    assert isinstance(result.exception, RuntimeError)
+    assert slugs(app) == ['imported-0', 'imported-1', 'imported-2']
+
+    monkeypatch.setattr(Checkpoint, 'save', save)
+    result = runner.invoke(args=['import', 'posts', str(path), '--batch-size', '3', '--workers', '1'])
+    assert result.exit_code == 0, result.output
+    assert 'Resuming after 3 records' in result.output
+    assert 'Imported 4 posts' in result.output
+    assert slugs(app) == [f'imported-{n}' for n in range(7)]
+    assert not (tmp_path / 'posts.jsonl.checkpoint').exists()
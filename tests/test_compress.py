@@ -0,0 +1,113 @@
+import gzip
+import zlib
+
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Request, Response
+
+from compress import CompressionMiddleware, negotiate
+
+ALL = ('zstd', 'br', 'gzip')
+PAGE = b'<p>' + b'hello compression ' * 200 + b'</p>'
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, None),
+    ('', None),
+    ('gzip', 'gzip'),
+    ('gzip, br', 'br'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('br;q=0, gzip;q=0.1', 'gzip'),
+    ('gzip;q=0', None),
+    ('*', 'zstd'),
+    ('*;q=0, gzip', 'gzip'),
+    ('identity;q=0, gzip', 'gzip'),
+    ('identity;q=0', None),
+    ('deflate, compress', None),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept, ALL) == expected
+
+
+def client_for(make_response, min_size=100):
+    @Request.application
+    def app(request):
+        return make_response()
+
+    return Client(CompressionMiddleware(app, min_size=min_size, levels={'gzip': 6}))
+
+
+def test_compresses_text_for_clients_that_accept_it():
+    response = client_for(lambda: Response(PAGE, mimetype='text/html', headers={'ETag': '"abc"'})) \
+        .get(headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"abc"'
+    assert gzip.decompress(response.get_data()) == PAGE
+
+
+@pytest.mark.parametrize('headers', [{}, {'Accept-Encoding': 'identity;q=0'}])
+def test_clients_that_accept_nothing_get_identity(headers):
+    response = client_for(lambda: Response(PAGE, mimetype='text/html')).get(headers=headers)
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.get_data() == PAGE
+
+
+@pytest.mark.parametrize('response', [
+    # Already encoded by the view
+    Response(gzip.compress(PAGE), mimetype='text/html', headers={'Content-Encoding': 'gzip'}),
+    # Images are compressed already
+    Response(b'\x89PNG\r\n\x1a\n' + PAGE, mimetype='image/png'),
+    Response(PAGE, mimetype='text/html', headers={'Cache-Control': 'no-transform'}),
+    Response(status=304),
+])
+def test_passes_through(response):
+    body = response.get_data()
+    sent = client_for(lambda: response).get(headers={'Accept-Encoding': 'gzip'})
+    assert sent.headers.get('Content-Encoding') == response.headers.get('Content-Encoding')
+    assert 'Vary' not in sent.headers
+    assert sent.get_data() == body
+
+
+def test_small_bodies_are_not_compressed():
+    client = client_for(lambda: Response(b'<p>hi</p>', mimetype='text/html'))
+    response = client.get(headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b'<p>hi</p>'
+
+
+def test_small_streamed_body_is_not_compressed():
+    client = client_for(lambda: Response(iter([b'<p>', b'hi', b'</p>']), mimetype='text/html'))
+    response = client.get(headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b'<p>hi</p>'
+
+
+def test_head_is_not_compressed():
+    client = client_for(lambda: Response(PAGE, mimetype='text/html'))
+    response = client.head(headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Content-Length'] == str(len(PAGE))
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk():
+    sent = []
+
+    def chunks():
+        for n in range(5):
+            sent.append(n)
+            yield PAGE
+
+    client = client_for(lambda: Response(chunks(), mimetype='text/html'))
+    response = client.get(headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    body = iter(response.response)
+    decoder = zlib.decompressobj(31)
+    # Each chunk is flushed as soon as it's read, not held for the next
+    assert decoder.decompress(next(body)) == PAGE
+    assert sent == [0]
+    assert decoder.decompress(b''.join(body)) == PAGE * 4
+    assert decoder.eof
+    response.close()
@@ -0,0 +1,11 @@
+from conftest import add_user, login
+
+
+def test_editor_pages_load_ckeditor(app, client):
+    add_user(app)
+    login(client)
+    assert client.post('/add_post', data={'title': 'Hello', 'content': '<p>Hi</p>', 'slug': 'hello'}).status_code == 302
+    for path in ('/add_post', '/posts/edit/1'):
+        page = client.get(path).get_data(as_text=True)
+        assert 'ckeditor.js' in page
+        assert 'CKEDITOR.replace( "content"' in page
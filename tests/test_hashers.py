@@ -0,0 +1,54 @@
+import hashlib
+import hmac
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from conftest import add_user, login
+from hashers import PasswordHasher
+from models import db, Users
+
+
+def legacy_hash(password, salt='NaCl1234'):
+    return f'sha256${salt}${hmac.new(salt.encode(), password.encode(), hashlib.sha256).hexdigest()}'
+
+
+def stored_hash(app, id):
+    with app.app_context():
+        return db.session.get(Users, id).password_hash
+
+
+def set_hash(app, id, pwhash):
+    with app.app_context():
+        db.session.get(Users, id).password_hash = pwhash
+        db.session.commit()
+
+
+def test_verify_legacy_and_current_hashes():
+    hasher = PasswordHasher(cost=1000, workers=1)
+    assert hasher.verify(legacy_hash('secret'), 'secret')
+    assert not hasher.verify(legacy_hash('secret'), 'Secret')
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+    assert not hasher.verify(None, 'secret')
+    assert hasher.needs_rehash(legacy_hash('secret'))
+    assert hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:500'))
+    assert not hasher.needs_rehash(hasher.hash('secret'))
+
+
+@pytest.mark.parametrize('old_hash', [legacy_hash('secret'), generate_password_hash('secret', 'pbkdf2:sha256:500')])
+def test_login_upgrades_an_old_hash(app, client, old_hash):
+    id = add_user(app)
+    set_hash(app, id, old_hash)
+
+    # A wrong password leaves it alone
+    assert 'wrong password' in login(client, password='nope').get_data(as_text=True)
+    assert stored_hash(app, id) == old_hash
+
+    assert login(client).status_code == 302
+    new_hash = stored_hash(app, id)
+    assert new_hash.startswith('pbkdf2:sha256:1000$')
+    assert app.extensions['password_hasher'].verify(new_hash, 'secret')
+    # And the new one logs in too
+    client.post('/logout')
+    assert login(client).status_code == 302
+    assert stored_hash(app, id) == new_hash
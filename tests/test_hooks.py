@@ -0,0 +1,56 @@
+import gc
+import os
+import weakref
+
+import hooks
+from app import create_app
+from config import TestingConfig
+from models import db
+
+
+class Resource:
+    def __init__(self):
+        self.forked = False
+
+
+def collect():
+    for _ in range(3):
+        gc.collect()
+
+
+def test_hooks_run_in_a_forked_child_without_keeping_objects_alive():
+    alive, dropped = Resource(), Resource()
+    hooks.after_fork(alive, lambda resource: setattr(resource, 'forked', True))
+    hooks.after_fork(dropped, lambda resource: setattr(resource, 'forked', True))
+    dropped = weakref.ref(dropped)
+    collect()
+    assert dropped() is None
+
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if alive.forked else 1)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert not alive.forked
+
+
+def test_discarded_apps_are_freed(tmp_path):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+
+    def make():
+        app = create_app(Config)
+        with app.app_context():
+            engine = db.engine
+        app.extensions['view_counter'].incr(1)
+        return [weakref.ref(service) for service in (app, engine, app.extensions['password_hasher'],
+                                                     app.extensions['view_counter'])]
+
+    make()
+    collect()
+    registered = len(hooks._after_fork), len(hooks._at_exit)
+    refs = make()
+    collect()
+    assert [ref() for ref in refs] == [None] * len(refs)
+    # The dead apps' hooks are dropped as new ones come in
+    make()
+    assert (len(hooks._after_fork), len(hooks._at_exit)) == registered
@@ -0,0 +1,49 @@
+import re
+from html import unescape
+
+import pytest
+
+from api import MAX_PER_PAGE
+from conftest import add_posts
+
+
+def post_titles(html):
+    return re.findall(r'<h2>(Post \d+)</h2>', html)
+
+
+@pytest.mark.parametrize('per_page, expected', [('100000', MAX_PER_PAGE), ('-3', 1), ('0', 1), ('5', 5)])
+def test_blog_posts_per_page_is_clamped(app, client, per_page, expected):
+    add_posts(app, MAX_PER_PAGE + 20)
+    html = client.get(f'/blog_posts?per_page={per_page}').get_data(as_text=True)
+    assert len(post_titles(html)) == expected
+
+
+@pytest.mark.parametrize('per_page, expected', [('100000', MAX_PER_PAGE), ('-3', 1), ('5', 5)])
+def test_author_per_page_is_clamped(app, client, per_page, expected):
+    add_posts(app, MAX_PER_PAGE + 20, authors=1)
+    html = client.get(f'/authors/author0?per_page={per_page}').get_data(as_text=True)
+    assert len(post_titles(html)) == expected
+
+
+def page_link(html, label):
+    return unescape(re.search(rf'href="([^"]+)">{label}</a>', html)[1])
+
+
+@pytest.mark.parametrize('path', ['/blog_posts', '/authors/author0'])
+def test_page_links_keep_per_page(app, client, path):
+    add_posts(app, 20, authors=1)
+    html = client.get(f'{path}?per_page=3').get_data(as_text=True)
+    assert post_titles(html) == ['Post 19', 'Post 18', 'Post 17']
+
+    older = page_link(html, 'Older posts')
+    assert 'per_page=3' in older
+    html = client.get(older).get_data(as_text=True)
+    assert post_titles(html) == ['Post 16', 'Post 15', 'Post 14']
+
+    html = client.get(page_link(html, 'Newer posts')).get_data(as_text=True)
+    assert post_titles(html) == ['Post 19', 'Post 18', 'Post 17']
+
+
+def test_page_links_leave_out_the_default_per_page(app, client):
+    add_posts(app, 20)
+    assert 'per_page' not in page_link(client.get('/blog_posts').get_data(as_text=True), 'Older posts')
@@ -0,0 +1,27 @@
+"""A page of posts costs the same number of SQL statements however many posts and authors it shows."""
+import pytest
+
+from conftest import add_posts
+
+
+def statements_for(client, queries, path):
+    client.get(path)  # warm up the slug map and anything else loaded once per process
+    queries.clear()
+    response = client.get(path)
+    assert response.status_code == 200
+    response.get_data()
+    return len(queries)
+
+
+@pytest.mark.parametrize('path', ['/blog_posts', '/search?searched=flask', '/posts/post-0'])
+def test_page_statements_do_not_grow_with_posts(app, client, queries, path):
+    add_posts(app, 2, authors=2)
+    few = statements_for(client, queries, path)
+    add_posts(app, 40, authors=7)
+    many = statements_for(client, queries, path)
+    assert many == few
+
+
+def test_blog_posts_is_one_statement(app, client, queries):
+    add_posts(app, 25, authors=5)
+    assert statements_for(client, queries, '/blog_posts') == 1
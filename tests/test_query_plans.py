@@ -0,0 +1,44 @@
+"""The queries the views run on every request read through an index, never a whole table."""
+from conftest import add_posts
+from database import explain_query_plan, full_scans
+from models import (db, Users, PostsPage, author_posts, decode_cursor, most_viewed_posts, posts_page_query,
+                    posts_with_posters, user_by_email, user_by_username, users_by_created)
+from search import fts_query, search_statements
+
+CURSOR = '2024-01-01T00:10:00_11'
+
+
+def hot_queries():
+    """(name, statement) for each query, built the way the views build them."""
+    author = Users.query.first()
+    cursor = decode_cursor(CURSOR)
+    before = PostsPage(posts_with_posters(), before=CURSOR, per_page=10)
+    search_count, search_hits = search_statements(fts_query('flask post'), page=2, per_page=10)
+    return [
+        ('login, author: user by username', user_by_username('alice')),
+        ('add_user, test_pw: user by email', user_by_email('alice@example.com')),
+        ('add_user: users by created', users_by_created()),
+        ('blog_posts: first page', PostsPage(posts_with_posters(), per_page=10).page_query()),
+        ('blog_posts: after a cursor', PostsPage(posts_with_posters(), after=CURSOR, per_page=10).page_query()),
+        ('blog_posts: bound of a page before a cursor', before.bound_query()),
+        ('blog_posts: page before a cursor', before.page_query(cursor)),
+        ('most_viewed', most_viewed_posts(10)),
+        ('author: first page', posts_page_query(author_posts(author), per_page=10)),
+        ('author: after a cursor', posts_page_query(author_posts(author), after=cursor, per_page=10)),
+        ('author: before a cursor', posts_page_query(author_posts(author), before=cursor, per_page=10)),
+        ('search: count', search_count),
+        ('search: hits', search_hits),
+    ]
+
+
+def test_no_query_reads_a_whole_table(app):
+    add_posts(app, 30)
+    with app.app_context():
+        plans = {name: explain_query_plan(db.session, query) for name, query in hot_queries()}
+    assert {name: plan for name, plan in plans.items() if full_scans(plan)} == {}
+
+
+def test_full_scans_flags_a_table_scan(app):
+    with app.app_context():
+        plan = explain_query_plan(db.session, Users.query.filter_by(favorite_color='Red'))
+    assert full_scans(plan) == ['SCAN users']
@@ -0,0 +1,105 @@
+import pytest
+
+import ratelimit
+from ratelimit import MemoryBuckets, RateLimiter, SQLiteBuckets
+
+
+class Clock:
+    """Stands in for the time module in ratelimit, moved on by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def buckets(request, tmp_path, clock):
+    if request.param == 'memory':
+        return MemoryBuckets()
+    return SQLiteBuckets(str(tmp_path / 'ratelimit.db'))
+
+
+def test_bucket_empties_and_refills(buckets, clock):
+    # 2 at once, then one a second
+    assert buckets.take('key', 2, 1.0) == 0
+    assert buckets.take('key', 2, 1.0) == 0
+    assert buckets.take('key', 2, 1.0) == pytest.approx(1.0)
+    clock.advance(0.5)
+    assert buckets.take('key', 2, 1.0) == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert buckets.take('key', 2, 1.0) == 0
+    assert buckets.take('key', 2, 1.0) == pytest.approx(1.0)
+    # Other keys have buckets of their own
+    assert buckets.take('other', 2, 1.0) == 0
+    # Never more than capacity, however long it has been
+    clock.advance(3600)
+    assert [buckets.take('key', 2, 1.0) for _ in range(3)] == [0, 0, pytest.approx(1.0)]
+
+
+def test_memory_buckets_drop_refilled_then_least_recently_used(clock):
+    buckets = MemoryBuckets(max_keys=2)
+    buckets.take('a', 1, 1.0)
+    clock.advance(2)
+    buckets.take('b', 1, 1.0)
+    assert len(buckets) == 1
+    buckets.take('c', 1, 1.0)
+    buckets.take('b', 1, 1.0)
+    buckets.take('d', 1, 1.0)
+    assert len(buckets) == 2
+    # Still empty b was used after c, so c went
+    assert buckets.take('b', 1, 1.0) > 0
+    assert buckets.take('c', 1, 1.0) == 0
+
+
+def test_sqlite_buckets_are_shared_and_purged(tmp_path, clock):
+    path = str(tmp_path / 'ratelimit.db')
+    first, second = SQLiteBuckets(path, purge_interval=60), SQLiteBuckets(path)
+    assert first.take('key', 1, 1.0) == 0
+    assert second.take('key', 1, 1.0) == pytest.approx(1.0)
+    assert len(second) == 1
+    clock.advance(61)
+    first.take('other', 1, 1.0)
+    assert len(second) == 1
+
+
+def test_limiter_counts_and_can_be_disabled(clock):
+    limiter = RateLimiter(MemoryBuckets(), {'ip': (1, 60)})
+    assert limiter.hit('ip', '10.0.0.1') == 0
+    assert limiter.hit('ip', '10.0.0.1') == pytest.approx(60)
+    assert limiter.stats() == {'ip': {'allowed': 1, 'rejected': 1}}
+    limiter.enabled = False
+    assert limiter.hit('ip', '10.0.0.1') == 0
+
+
+def test_login_over_the_limit_gets_429_until_refilled(make_app, clock):
+    app = make_app(RATE_LIMIT_PER_USERNAME=(3, 60))
+    client = app.test_client()
+
+    def login(username='alice'):
+        return client.post('/login', data={'username': username, 'password_hash': 'wrong'})
+
+    assert [login().status_code for _ in range(3)] == [200, 200, 200]
+    response = login()
+    assert response.status_code == 429
+    # A token every 20 seconds
+    assert response.headers['Retry-After'] == '20'
+    # Other usernames from the same address aren't affected
+    assert login('bob').status_code == 200
+    clock.advance(20)
+    assert login().status_code == 200
+    assert login().status_code == 429
+    assert app.extensions['rate_limiter'].stats()['username'] == {'allowed': 5, 'rejected': 2}
@@ -0,0 +1,37 @@
+from sqlalchemy import text
+
+from app import flush_post_views
+from conftest import add_posts
+from models import db, Posts
+
+
+def index_writes(app, action):
+    """Rows action adds to or removes from the FTS index's segment storage."""
+    with app.app_context():
+        before = db.session.execute(text('SELECT count(*), sum(length(block)) FROM posts_fts_data')).one()
+        db.session.commit()
+    action()
+    with app.app_context():
+        after = db.session.execute(text('SELECT count(*), sum(length(block)) FROM posts_fts_data')).one()
+    return tuple(after) != tuple(before)
+
+
+def test_view_flush_leaves_search_index_alone(app):
+    add_posts(app, 20)
+    with app.app_context():
+        ids = [id for id, in db.session.query(Posts.id)]
+    assert not index_writes(app, lambda: flush_post_views(app, {id: 3 for id in ids}))
+    with app.app_context():
+        assert db.session.query(db.func.sum(Posts.views)).scalar() == 60
+
+
+def test_edited_title_is_searchable(app, client):
+    add_posts(app, 3)
+
+    def rename():
+        with app.app_context():
+            db.session.get(Posts, 1).title = 'Renamed zeppelin'
+            db.session.commit()
+
+    assert index_writes(app, rename)
+    assert 'Renamed zeppelin' in client.get('/search?searched=zeppelin').get_data(as_text=True)
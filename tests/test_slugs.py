@@ -0,0 +1,10 @@
+from conftest import add_posts
+
+
+def test_detail_post_redirects_to_the_current_slug(app, client):
+    add_posts(app, 1)
+    response = client.get('/detail_post/1')
+    # Temporary: the slug can be edited later
+    assert response.status_code == 302
+    assert response.location == '/posts/post-0'
+    assert client.get(response.location).status_code == 200
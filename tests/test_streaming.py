@@ -0,0 +1,51 @@
+import sys
+
+from conftest import add_posts, add_user, login
+
+
+def test_streamed_page_consumes_flashes(app, client):
+    add_user(app)
+    login(client)
+    response = client.post('/add_post', data={'title': 'Hello', 'content': '<p>Hi</p>', 'slug': 'hello'})
+    assert response.status_code == 302
+
+    pages = [client.get('/blog_posts').get_data(as_text=True) for _ in range(3)]
+    assert 'OK' in pages[0]
+    assert 'OK' not in pages[1] and 'OK' not in pages[2]
+    assert 'OK' not in client.get('/dashboard').get_data(as_text=True)
+
+
+def test_streamed_page_with_flash_is_cached_afterwards(app, client):
+    app.extensions['page_cache'].maxsize = 100
+    add_posts(app, 3)
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Welcome')]
+    assert 'Welcome' in client.get('/blog_posts').get_data(as_text=True)
+    # Flashes gone, so the page is cached once it has been sent in full
+    response = client.get('/blog_posts')
+    response.get_data()
+    response.close()
+    assert response.headers['X-Cache'] == 'MISS'
+    assert client.get('/blog_posts').headers['X-Cache'] == 'HIT'
+
+
+def test_head_of_streamed_page_is_recorded(make_app):
+    app = make_app(INSTRUMENTATION_ENABLED=True, PROFILE_SAMPLE_RATE=1.0, PAGE_CACHE_SIZE=100)
+    instrumentation = app.extensions['instrumentation']
+    add_posts(app, 3)
+    client = app.test_client()
+
+    response = client.head('/blog_posts')
+    assert response.status_code == 200
+    response.close()
+    assert instrumentation.endpoints['main.blog_posts'].requests == 1
+    assert not instrumentation._profile_lock.locked()
+    assert sys.getprofile() is None
+    # A body that was never sent isn't cached
+    response = client.get('/blog_posts')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert 'Post 2' in response.get_data(as_text=True)
+    response.close()
+    assert instrumentation.endpoints['main.blog_posts'].requests == 2
+    assert instrumentation.endpoints['main.blog_posts'].profile is not None
+    assert client.get('/blog_posts').headers['X-Cache'] == 'HIT'
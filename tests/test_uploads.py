@@ -0,0 +1,83 @@
+import io
+import os
+import stat
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from conftest import add_user, login
+from uploads import UMASK, UploadStream
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 56
+
+
+def test_committed_file_gets_the_default_mode(tmp_path):
+    stream = UploadStream(tmp_path, max_size=None)
+    stream.write(PNG)
+    stream.commit(tmp_path / 'pic.png')
+    assert stat.S_IMODE(os.stat(tmp_path / 'pic.png').st_mode) == 0o666 & ~UMASK
+    assert os.listdir(tmp_path) == ['pic.png']
+
+
+def test_stream_rejects_oversized_and_non_image_files(tmp_path):
+    stream = UploadStream(tmp_path, max_size=100)
+    stream.write(PNG)
+    with pytest.raises(RequestEntityTooLarge):
+        stream.write(PNG)
+    assert os.listdir(tmp_path) == []
+
+    stream = UploadStream(tmp_path, max_size=None)
+    with pytest.raises(UnsupportedMediaType):
+        stream.write(b'<?php echo "hi"; ?>')
+    assert os.listdir(tmp_path) == []
+
+    # Too short to tell
+    stream = UploadStream(tmp_path, max_size=None)
+    stream.write(b'GIF')
+    with pytest.raises(UnsupportedMediaType):
+        stream.check()
+    stream.close()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.fixture
+def uploads(make_app, tmp_path):
+    folder = tmp_path / 'uploads'
+    folder.mkdir()
+    app = make_app(UPLOAD_FOLDER=str(folder), MAX_UPLOAD_FILE_SIZE=1024)
+    add_user(app)
+    client = app.test_client()
+    login(client)
+
+    def upload(data, filename='pic.png'):
+        return client.post('/dashboard', data={'name': 'Alice', 'email': 'alice@example.com',
+                                               'favorite_color': 'Red', 'about_author': '',
+                                               'username': 'alice',
+                                               'profile_pic': (io.BytesIO(data), filename)})
+    return folder, upload
+
+
+@pytest.mark.parametrize('data, status', [
+    (PNG * 20, 413),
+    (b'GIF89a' + b'\x00' * 2000, 413),
+    (b'#!/bin/sh\nrm -rf /\n' * 4, 415),
+    (b'', 415),
+])
+def test_rejected_upload_leaves_no_file(uploads, data, status):
+    folder, upload = uploads
+    response = upload(data)
+    assert response.status_code == status
+    assert os.listdir(folder) == []
+
+
+def test_upload_aborted_by_the_view_leaves_no_file(uploads, monkeypatch):
+    folder, upload = uploads
+    def commit():
+        raise RuntimeError('database is locked')
+
+    # The database update fails after the whole file has been received
+    monkeypatch.setattr('app.db.session.commit', commit)
+    response = upload(PNG)
+    assert response.status_code == 200
+    assert 'Error Updating!' in response.get_data(as_text=True)
+    assert os.listdir(folder) == []
@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# Read once: os.umask() can only be read by setting it, which isn't
+# safe once request threads are running
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+
+
+def is_image(header):
+    """Check the magic bytes of a PNG, JPEG, GIF or WebP file."""
+    return (header.startswith(b'\x89PNG\r\n\x1a\n')
+            or header.startswith(b'\xff\xd8\xff')
+            or header.startswith((b'GIF87a', b'GIF89a'))
+            or (header.startswith(b'RIFF') and header[8:12] == b'WEBP'))
+
+
+class UploadStream:
+    """Write an uploaded file straight to a temp file in the upload folder.
+
+    Werkzeug's form parser feeds it one chunk at a time, so memory use does
+    not depend on the file size. The size limit and the image magic bytes
+    are checked as the chunks arrive, before the rest of the body is read.
+    commit() atomically renames the temp file into place; otherwise it is
+    removed when the request closes.
+    """
+
+    HEADER_SIZE = 12
+
+    def __init__(self, folder, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self._header = b''
+        fd, self.path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            self.close()
+            raise RequestEntityTooLarge()
+        if len(self._header) < self.HEADER_SIZE:
+            self._header += chunk[:self.HEADER_SIZE]
+            if len(self._header) >= self.HEADER_SIZE and not is_image(self._header):
+                self.close()
+                raise UnsupportedMediaType('Profile picture must be a PNG, JPEG, GIF or WebP image.')
+        return self._file.write(chunk)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def check(self):
+        """Reject files too short to carry an image header, such as empty ones."""
+        if not is_image(self._header):
+            raise UnsupportedMediaType('Profile picture must be a PNG, JPEG, GIF or WebP image.')
+
+    def commit(self, dest):
+        # mkstemp() makes the file 0600, give it the mode open() would
+        os.fchmod(self._file.fileno(), 0o666 & ~UMASK)
+        self._file.close()
+        os.replace(self.path, dest)
+        self.path = None
+
+    def close(self):
+        # Also called on a rejected upload, then again when the request closes
+        self._file.close()
+        if self.path is not None:
+            os.unlink(self.path)
+            self.path = None
+
+
+class UploadRequest(Request):
+    """Request class that streams file uploads to disk with UploadStream."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadStream(current_app.config['UPLOAD_FOLDER'],
+                            current_app.config['MAX_UPLOAD_FILE_SIZE'])
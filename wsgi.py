@@ -0,0 +1,14 @@
+"""Entry point for WSGI servers.
+
+The profile comes from FLASKER_CONFIG (development, testing, production).
+To use every core, run one process per core with a prefork server, e.g.:
+
+    FLASKER_CONFIG=production SECRET_KEY=... gunicorn --preload -w 4 wsgi:app
+
+--preload builds the app once in the master process; create_app() opens no
+database connections and forked workers dispose of the inherited engine
+pool, so no SQLite handle is shared between processes.
+"""
+from app import create_app
+
+app = create_app()